@@ -1,9 +1,14 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
-from config.database import engine, Base
+from config.database import engine, async_engine, Base, SessionLocal, pools_snapshot
+from config.settings import settings
 from middlewares.error_handler import ErrorHandler
 
 # Routers
@@ -16,16 +21,58 @@ from routers.detalle_venta import detalle_ventas_router
 from routers.ws import ws_router
 from routers.devoluciones import devoluciones_router
 from routers.gastos import gastos_router
+from routers.reportes import reportes_router
+from routers.caja import caja_router
+from routers.debug import debug_router
+from utils.connection_manager import manager
+from utils.health import readiness
+from utils.image_pipeline import UploadsStaticFiles, image_pipeline
+from utils.import_jobs import import_jobs
+from utils.metrics import metrics
+from services.productos import asegurar_version_catalogo, purgar_cambios
+from utils.stock_alerts import stock_alerts
+
+logger = logging.getLogger(__name__)
+
+def _purgar_cambios() -> int:
+    with SessionLocal() as db:
+        return purgar_cambios(db, settings.producto_cambios_retencion_dias)
+
+async def _purga_periodica():
+    # Poda diaria del registro de cambios de productos
+    while True:
+        try:
+            n = await run_in_threadpool(_purgar_cambios)
+            if n:
+                logger.info("Cambios de productos purgados: %s", n)
+        except Exception:
+            logger.exception("No se pudo purgar el registro de cambios")
+        await asyncio.sleep(24 * 3600)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Backend de broadcast de los WebSockets (memoria o pub/sub entre workers)
+    await manager.start()
+    stock_alerts.bind_loop(asyncio.get_running_loop())
+    image_pipeline.start()
+    purga = asyncio.create_task(_purga_periodica())
+    yield
+    purga.cancel()
+    image_pipeline.shutdown()
+    import_jobs.shutdown()
+    await manager.stop()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="API de Ventas y Stock",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Montar carpeta de uploads para servir imágenes
+# Montar carpeta de uploads para servir imágenes (variantes con cache inmutable)
 app.mount(
     "/uploads",
-    StaticFiles(directory="uploads"),
+    UploadsStaticFiles(directory="uploads"),
     name="uploads"
 )
 
@@ -39,6 +86,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing", "X-DB-Queries", "X-DB-Repeated"],
 )
 
 # Incluir routers
@@ -51,14 +99,38 @@ app.include_router(detalle_ventas_router)
 app.include_router(ws_router)
 app.include_router(devoluciones_router)
 app.include_router(gastos_router)
+app.include_router(reportes_router)
+app.include_router(caja_router)
+if settings.debug_queries:
+    app.include_router(debug_router)
 
 # Crear tablas si no existen
 Base.metadata.create_all(bind=engine)
+with SessionLocal() as _db:
+    asegurar_version_catalogo(_db)
 
 @app.get("/", tags=["home"])
 def message():
     return HTMLResponse("<h1>API de Control de Ventas, Stock y Devoluciones</h1>")
 
-@app.get("/health")
+@app.get("/health", tags=["health"])
+@app.get("/health/live", tags=["health"])
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    # Liveness: el proceso responde; no toca dependencias
+    return {"status": "ok"}
+
+@app.get("/health/ready", tags=["health"])
+async def health_ready():
+    # Readiness: base, pool, uploads y WebSockets (cacheado unos segundos); 503 si no está listo
+    ready, detail = await readiness.check()
+    return JSONResponse(detail, status_code=200 if ready else 503)
+
+@app.get("/health/pool", tags=["health"])
+def health_pool():
+    # Estado de los pools sync y async: en uso, overflow y tiempos de espera
+    return pools_snapshot()
+
+@app.get("/metrics", tags=["health"], response_class=PlainTextResponse)
+def metrics_endpoint():
+    # Formato de exposición de texto de Prometheus
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
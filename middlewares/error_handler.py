@@ -1,13 +1,109 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import FastAPI, Request, Response
-from fastapi.responses import JSONResponse
+import json
+import logging
+import time
 
-class ErrorHandler(BaseHTTPMiddleware):
-    def __init__(self, app: FastAPI) -> None:
-        super().__init__(app)
+from sqlalchemy.exc import IntegrityError, OperationalError, TimeoutError as PoolTimeoutError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.settings import settings
+from utils.metrics import metrics
+from utils.request_timing import query_history, start_query_log, start_request
+
+logger = logging.getLogger(__name__)
+
+def _error_response(exc: Exception) -> tuple[int, dict]:
+    # Errores de base conocidos con un status útil; el resto es 500 sin detalles internos
+    if isinstance(exc, (PoolTimeoutError, OperationalError)):
+        return 503, {"error": "Base de datos no disponible, reintentar"}
+    if isinstance(exc, IntegrityError):
+        return 409, {"error": "Conflicto con datos existentes"}
+    return 500, {"error": "Error interno del servidor"}
+
+class ErrorHandler:
+    """
+    Middleware ASGI puro: captura errores no manejados sin bufferear la
+    respuesta, agrega Server-Timing (total, db, auth hasta enviar los
+    headers) y registra los requests lentos.
+    """
+
+    def __init__(self, app: ASGIApp, slow_ms: float | None = None, debug_queries: bool | None = None) -> None:
+        self.app = app
+        self.slow_ms = settings.slow_request_ms if slow_ms is None else slow_ms
+        self.debug_queries = settings.debug_queries if debug_queries is None else debug_queries
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings = start_request()
+        queries = start_query_log(settings.n_plus_one_threshold) if self.debug_queries else None
+        status_code = 500
+        started = False
+        metrics.inc("http_requests_in_flight")
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, started
+            if message["type"] == "http.response.start":
+                started = True
+                status_code = message["status"]
+                total = (time.perf_counter() - start) * 1000
+                metricas = [f"total;dur={total:.1f}"] + [
+                    f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()
+                ]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(metricas).encode("latin-1")))
+                if queries is not None:
+                    headers.append((b"x-db-queries", str(queries.count).encode()))
+                    headers.append((b"x-db-repeated", str(len(queries.repeated())).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
 
-    async def dispatch(self, request: Request, call_next) -> Response | JSONResponse:
         try:
-            return await call_next(request)
-        except Exception as e:
-            return JSONResponse(status_code=500, content={'error': str(e)})
\ No newline at end of file
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            logger.exception("Error no manejado en %s %s", scope["method"], scope["path"])
+            if started:
+                # Ya se mandaron los headers: solo queda cortar la conexión
+                raise
+            status_code, content = _error_response(exc)
+            body = json.dumps(content).encode()
+            await send_wrapper({
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            route = getattr(scope.get("route"), "path", None)
+            # Sin ruta (404) se agrupa para no crear una serie por URL
+            etiqueta = route or "sin_ruta"
+            metrics.inc("http_requests_in_flight", value=-1)
+            metrics.inc("http_requests_total", (scope["method"], etiqueta, str(status_code)))
+            metrics.observe("http_request_duration_seconds", (scope["method"], etiqueta), elapsed / 1000)
+            if queries is not None:
+                self._registrar_consultas(scope, status_code, elapsed, queries)
+            if elapsed >= self.slow_ms:
+                logger.warning(
+                    "Request lento: %s %s -> %s en %.0f ms (db %.0f ms, auth %.0f ms)",
+                    scope["method"], route or scope["path"], status_code, elapsed,
+                    timings.get("db", 0.0) * 1000, timings.get("auth", 0.0) * 1000,
+                )
+
+    def _registrar_consultas(self, scope: Scope, status_code: int, elapsed: float, queries) -> None:
+        route = getattr(scope.get("route"), "path", scope["path"])
+        summary = queries.summary()
+        if summary["repeated"]:
+            logger.warning("Posible N+1 en %s %s: %s", scope["method"], route, summary["repeated"])
+        query_history.append({
+            "method": scope["method"],
+            "route": route,
+            "status": status_code,
+            "ms": round(elapsed, 3),
+            **summary,
+        })
@@ -1,15 +1,21 @@
 from fastapi import Request, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from services.usuarios import UsuariosService
+from services.usuarios import AsyncUsuariosService
 from utils.jwt_manager import validate_token
-from models.usuarios import Usuarios as UsuarioModel
-from config.database import SessionLocal
+from utils.request_timing import timed
+from utils.user_cache import user_cache
+from config.database import AsyncSessionLocal
 
 class JWTBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True):
         super().__init__(auto_error=auto_error)
 
     async def __call__(self, request: Request) -> HTTPAuthorizationCredentials:
+        # El tiempo de autenticación se informa en Server-Timing
+        with timed("auth"):
+            return await self._authenticate(request)
+
+    async def _authenticate(self, request: Request) -> HTTPAuthorizationCredentials:
         # Esto extrae el header y valida que tenga Bearer token
         credentials: HTTPAuthorizationCredentials = await super().__call__(request)
         token = credentials.credentials
@@ -20,14 +26,19 @@ class JWTBearer(HTTPBearer):
         except Exception:
             raise HTTPException(status_code=403, detail="Token inválido o expirado")
 
-        # 2) Abrir sesión y chequear que el usuario exista
-        db = SessionLocal()
-        try:
-            usuarios_db: list[UsuarioModel] = UsuariosService(db).get_usuarios()
-            if not any(u.username == payload["username"] for u in usuarios_db):
+        # 2) Chequear que el usuario exista: primero en cache, si no en la base
+        username = payload.get("username")
+        if user_cache.get(username) is None:
+            # Sesión async: la consulta no bloquea el event loop
+            async with AsyncSessionLocal() as db:
+                usuario = await AsyncUsuariosService(db).get_by_username(username)
+            if not usuario:
                 raise HTTPException(status_code=403, detail="Usuario no encontrado")
-        finally:
-            db.close()
+            user_cache.set(username, {
+                "id": usuario.id,
+                "username": usuario.username,
+                "role": usuario.role,
+            })
 
         # 3) Si todo está ok, devolvemos las credenciales para que FastAPI continúe
         return credentials
\ No newline at end of file
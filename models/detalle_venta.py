@@ -1,5 +1,7 @@
 from sqlalchemy import Column, Integer, Float, ForeignKey
+from sqlalchemy.orm import relationship
 from config.database import Base
+from models.productos import Producto
 
 class DetalleVenta(Base):
     __tablename__ = "detalle_ventas"
@@ -12,3 +14,5 @@ class DetalleVenta(Base):
     subtotal = Column(Float, nullable=False)
     descuento_individual = Column(Float, nullable=False)
     costo_unitario = Column(Float, default=0) # Nuevo campo para costo histórico
+
+    producto = relationship(Producto, viewonly=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, func, Float, Boolean, String
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, func, Float, Boolean, String, Index
 from sqlalchemy.orm import relationship
 from config.database import Base
 
@@ -13,11 +13,17 @@ class Devolucion(Base):
     # relación a los detalles de devolución
     detalles = relationship("DetalleDevolucion", back_populates="devolucion")
 
+    # Índices para el historial paginado por (fecha, id) y el filtro por venta
+    __table_args__ = (
+        Index("ix_devoluciones_fecha_id", "fecha", "id"),
+        Index("ix_devoluciones_venta_fecha_id", "venta_id", "fecha", "id"),
+    )
+
 
 class DetalleDevolucion(Base):
     __tablename__ = "devoluciones_detalle"
     id = Column(Integer, primary_key=True, index=True)
-    devolucion_id = Column(Integer, ForeignKey("devoluciones.id"), nullable=False)
+    devolucion_id = Column(Integer, ForeignKey("devoluciones.id"), nullable=False, index=True)
     producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False)
     cantidad = Column(Integer, nullable=False)
     precio_unitario = Column(Float, nullable=False)
@@ -8,7 +8,7 @@ class Gasto(Base):
     __tablename__ = "gastos"
 
     id          = Column(Integer, primary_key=True, index=True)
-    fecha       = Column(DateTime, nullable=False, default=datetime.utcnow)
+    fecha       = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
     monto       = Column(Float, nullable=False)
     descripcion = Column(String(255), nullable=True)
     usuario_id  = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean, DateTime, JSON, func
 from config.database import Base
 
 class Producto(Base):
@@ -21,3 +21,46 @@ class Producto(Base):
     categoria_id    = Column(Integer, ForeignKey("categorias.id"), nullable=True)
     activo          = Column(Boolean, default=True, nullable=False)
     image_url       = Column(String(255), nullable=True)
+
+class ProductoCambio(Base):
+    """
+    Registro de cambios de productos (stock, precio, activo, imagen...).
+    `version` sale del contador de CatalogoVersion, no del id: el
+    AUTO_INCREMENT se asigna al INSERT y no al COMMIT, así que un id menor
+    podía hacerse visible después de que un cliente ya leyó uno mayor.
+    """
+    __tablename__ = "productos_cambios"
+
+    id          = Column(Integer, primary_key=True)
+    producto_id = Column(Integer, nullable=False, index=True)
+    version     = Column(Integer, nullable=False, index=True)
+    fecha       = Column(DateTime, server_default=func.now(), index=True)
+
+class CatalogoVersion(Base):
+    """
+    Fila única (id=1) con la versión actual del catálogo. Cada transacción que
+    cambia productos la incrementa y queda con el lock de la fila hasta el
+    commit, así las versiones se hacen visibles en orden.
+    """
+    __tablename__ = "catalogo_version"
+
+    id      = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(Integer, nullable=False, default=0)
+
+class ImportacionPrecios(Base):
+    """
+    Estado de una importación de precios en segundo plano. Vive en la base y
+    no en memoria del worker: cualquier worker responde la consulta por job_id
+    y el estado sobrevive a un reinicio.
+    """
+    __tablename__ = "importaciones_precios"
+
+    job_id         = Column(String(32), primary_key=True)
+    status         = Column(String(20), nullable=False, default="pendiente")
+    processed      = Column(Integer, nullable=False, default=0)
+    updated        = Column(Integer, nullable=False, default=0)
+    errors         = Column(JSON, nullable=False, default=list)
+    detail         = Column(String(255), nullable=True)
+    created_at     = Column(DateTime, nullable=False, index=True)
+    actualizado_en = Column(DateTime, nullable=False)
+    finished_at    = Column(DateTime, nullable=True)
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, Float, Date, String, Boolean
+from config.database import Base
+
+# Tablas de resumen diario, mantenidas incrementalmente por ventas y devoluciones
+
+class ReporteDiarioProducto(Base):
+    __tablename__ = "reporte_diario_producto"
+
+    fecha             = Column(Date, primary_key=True)
+    producto_id       = Column(Integer, primary_key=True)
+    cantidad          = Column(Float, nullable=False, default=0)
+    bruto             = Column(Float, nullable=False, default=0)   # precio_unitario * cantidad
+    neto              = Column(Float, nullable=False, default=0)   # con descuentos individual y global
+    costo             = Column(Float, nullable=False, default=0)   # costo_unitario histórico * cantidad
+    cantidad_devuelta = Column(Float, nullable=False, default=0)
+    monto_devuelto    = Column(Float, nullable=False, default=0)
+
+
+class ReporteDiarioFormaPago(Base):
+    __tablename__ = "reporte_diario_forma_pago"
+
+    fecha      = Column(Date, primary_key=True)
+    forma_pago = Column(String(20), primary_key=True)
+    pagado     = Column(Boolean, primary_key=True)
+    ventas     = Column(Integer, nullable=False, default=0)
+    bruto      = Column(Float, nullable=False, default=0)
+    neto       = Column(Float, nullable=False, default=0)
+
+
+class ReporteDiarioUsuario(Base):
+    __tablename__ = "reporte_diario_usuario"
+
+    fecha      = Column(Date, primary_key=True)
+    usuario_id = Column(Integer, primary_key=True)
+    ventas     = Column(Integer, nullable=False, default=0)
+    neto       = Column(Float, nullable=False, default=0)
+    costo      = Column(Float, nullable=False, default=0)
@@ -1,8 +1,11 @@
 # src/models/venta.py
 
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String, Boolean
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String, Boolean, Index
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from config.database import Base
+from models.detalle_venta import DetalleVenta
+from models.devoluciones import Devolucion
 
 class Venta(Base):
     __tablename__ = "ventas"
@@ -16,3 +19,15 @@ class Venta(Base):
     usuario_id           = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
     forma_pago           = Column(String(20), nullable=False, default="efectivo")
     pagado               = Column(Boolean, nullable=False, default=False)
+
+    # Relaciones de lectura (las líneas y devoluciones se escriben por sus FKs)
+    detalles     = relationship(DetalleVenta, order_by=DetalleVenta.id, viewonly=True)
+    devoluciones = relationship(Devolucion, order_by=Devolucion.id, viewonly=True)
+
+    # Índices compuestos para el listado paginado por (fecha, id) y sus filtros
+    __table_args__ = (
+        Index("ix_ventas_fecha_id", "fecha", "id"),
+        Index("ix_ventas_cliente_fecha_id", "cliente_id", "fecha", "id"),
+        Index("ix_ventas_usuario_fecha_id", "usuario_id", "fecha", "id"),
+        Index("ix_ventas_pago_fecha_id", "forma_pago", "pagado", "fecha", "id"),
+    )
@@ -0,0 +1,40 @@
+# routers/caja.py
+
+from datetime import date
+from typing import Literal
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from config.database import get_db
+from middlewares.jwt_bearer import JWTBearer
+from schemas.caja import CajaResumen
+from services.caja import CajaService, exportar_csv, exportar_xlsx
+
+caja_router = APIRouter(tags=["Caja"], dependencies=[Depends(JWTBearer())])
+
+@caja_router.get(
+    "/caja/resumen",
+    response_model=CajaResumen
+)
+def resumen_caja(desde: date | None = None, hasta: date | None = None, db: Session = Depends(get_db)):
+    return CajaService(db).resumen(desde, hasta)
+
+@caja_router.get("/caja/resumen/export")
+def exportar_resumen_caja(
+    formato: Literal["csv", "xlsx"] = "csv",
+    desde: date | None = None,
+    hasta: date | None = None,
+    db: Session = Depends(get_db),
+):
+    resumen = CajaService(db).resumen(desde, hasta)
+    nombre = f"caja_{desde or 'inicio'}_{hasta or 'hoy'}.{formato}"
+    headers = {"Content-Disposition": f'attachment; filename="{nombre}"'}
+    if formato == "xlsx":
+        return StreamingResponse(
+            exportar_xlsx(resumen),
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers=headers,
+        )
+    return StreamingResponse(exportar_csv(resumen), media_type="text/csv; charset=utf-8", headers=headers)
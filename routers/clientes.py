@@ -1,4 +1,4 @@
-from fastapi import APIRouter, status, Depends
+from fastapi import APIRouter, status, Depends, Query
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from config.database import get_db
@@ -6,6 +6,7 @@ from models.clientes import Cliente as ClienteModel
 from schemas.cliente import Cliente, ClienteCreate
 from services.clientes import ClienteService
 from middlewares.jwt_bearer import JWTBearer
+from utils.streaming import Formato, stream_response
 
 clientes_router = APIRouter()
 
@@ -15,7 +16,14 @@ clientes_router = APIRouter()
     tags=["Clientes"],
     dependencies=[Depends(JWTBearer())]
 )
-def get_clientes(db: Session = Depends(get_db)):
+def get_clientes(
+    formato: Formato = Query("json", alias="format"),
+    db: Session = Depends(get_db)
+):
+    if formato != "json":
+        return stream_response(
+            lambda s: ClienteService(s).query(), Cliente, formato, "clientes", clave=(ClienteModel.id,)
+        )
     result = ClienteService(db).get_all()
     return result
 
@@ -0,0 +1,17 @@
+# routers/debug.py
+
+from fastapi import APIRouter, Depends, Query
+
+from middlewares.jwt_bearer import JWTBearer
+from utils.request_timing import query_history
+
+# Solo se incluye en la app con DEBUG_QUERIES habilitado
+debug_router = APIRouter(tags=["Debug"], dependencies=[Depends(JWTBearer())])
+
+@debug_router.get("/debug/queries")
+def debug_queries(limit: int = Query(50, ge=1, le=200), solo_repetidas: bool = False):
+    # Últimos requests con cantidad de consultas, tiempo de base y sentencias repetidas
+    registros = list(query_history)[::-1]
+    if solo_repetidas:
+        registros = [r for r in registros if r["repeated"]]
+    return registros[:limit]
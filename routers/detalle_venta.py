@@ -1,4 +1,4 @@
-from fastapi import APIRouter, status, Depends
+from fastapi import APIRouter, status, Depends, Query
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from config.database import get_db
@@ -6,6 +6,7 @@ from models.detalle_venta import DetalleVenta as DetalleVentaModel
 from schemas.detalle_venta import DetalleVenta, DetalleVentaCreate
 from services.detalle_venta import DetalleVentaService
 from middlewares.jwt_bearer import JWTBearer
+from utils.streaming import Formato, stream_response
 
 detalle_ventas_router = APIRouter()
 
@@ -15,7 +16,15 @@ detalle_ventas_router = APIRouter()
     tags=["Detalle de ventas"],
     dependencies=[Depends(JWTBearer())]
 )
-def get_detalle_ventas(db: Session = Depends(get_db)):
+def get_detalle_ventas(
+    formato: Formato = Query("json", alias="format"),
+    db: Session = Depends(get_db)
+):
+    if formato != "json":
+        return stream_response(
+            lambda s: DetalleVentaService(s).query(), DetalleVenta, formato, "detalle_ventas",
+            clave=(DetalleVentaModel.id,),
+        )
     result = DetalleVentaService(db).get_all()
     return result
 
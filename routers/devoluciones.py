@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from config.database import SessionLocal
 
 from schemas.devoluciones import DevolucionCreate, DevolucionOut
 from services.devoluciones import (
     create_devolucion,
-    get_all_devoluciones,
+    get_devoluciones_page,
     get_devolucion_by_id,
     update_devolucion,
     delete_devolucion
@@ -28,8 +30,22 @@ def crear_dev(payload: DevolucionCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail=str(e))
 
 @devoluciones_router.get("/", response_model=list[DevolucionOut], tags=["Devoluciones"])
-def listar_devs(db: Session = Depends(get_db)):
-    return get_all_devoluciones(db)
+def listar_devs(
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=500),
+    cursor: str | None = None,
+    desde: datetime | None = None,
+    hasta: datetime | None = None,
+    venta_id: int | None = None,
+    db: Session = Depends(get_db)
+):
+    devoluciones, next_cursor = get_devoluciones_page(
+        db, limit=limit, cursor=cursor, desde=desde, hasta=hasta, venta_id=venta_id,
+    )
+    # Igual que /ventas: el cursor de la página siguiente va en X-Next-Cursor
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return devoluciones
 
 @devoluciones_router.get("/{id}", response_model=DevolucionOut)
 def obtener_dev(id: int, db: Session = Depends(get_db)):
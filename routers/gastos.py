@@ -1,13 +1,15 @@
 # routers/gastos.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from config.database import get_db
 from middlewares.jwt_bearer import JWTBearer
+from models.gastos import Gasto as GastoModel
 from schemas.gasto import Gasto, GastoCreate
 from services.gastos import GastoService
+from utils.streaming import Formato, stream_response
 
 gastos_router = APIRouter(tags=["Gastos"], dependencies=[Depends(JWTBearer())])
 
@@ -15,7 +17,15 @@ gastos_router = APIRouter(tags=["Gastos"], dependencies=[Depends(JWTBearer())])
     "/gastos",
     response_model=list[Gasto]
 )
-def list_gastos(db: Session = Depends(get_db)):
+def list_gastos(
+    formato: Formato = Query("json", alias="format"),
+    db: Session = Depends(get_db)
+):
+    if formato != "json":
+        return stream_response(
+            lambda s: GastoService(s).query(), Gasto, formato, "gastos",
+            clave=(GastoModel.fecha, GastoModel.id), descendente=True,
+        )
     return GastoService(db).get_all()
 
 @gastos_router.get(
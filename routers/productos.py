@@ -1,21 +1,28 @@
 # src/routers/productos.py
 
-from fastapi import APIRouter, status, Depends, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from pathlib import Path
-from io import BytesIO
+import asyncio
 
-from openpyxl import load_workbook
+from fastapi import APIRouter, status, Depends, UploadFile, File, Form, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from config.database import get_db
-from schemas.producto import Producto, ProductoCreate
-from services.productos import ProductoService
+from config.database import get_async_db, get_db
+from schemas.producto import Producto, ProductoCambios, ProductoCreate
+from services.productos import AsyncProductoService, ProductoService, version_catalogo
 from middlewares.jwt_bearer import JWTBearer
+from utils.import_jobs import import_jobs
+from utils.catalog_cache import catalog_cache
+from utils.image_pipeline import image_pipeline
 
 productos_router = APIRouter()
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+
+async def _procesar_imagen(file: UploadFile) -> str:
+    # Redimensiona y guarda las variantes en el pool de imágenes; devuelve la URL principal
+    if file.content_type not in ("image/jpeg", "image/png"):
+        raise HTTPException(status_code=400, detail="Solo JPEG o PNG")
+    return await image_pipeline.process(await file.read())
 
 @productos_router.get(
     "/productos",
@@ -23,8 +30,51 @@ UPLOAD_DIR.mkdir(exist_ok=True)
     tags=["Productos"],
     dependencies=[Depends(JWTBearer())]
 )
-def get_productos(db: Session = Depends(get_db)):
-    return ProductoService(db).get_all()
+def get_productos(request: Request, db: Session = Depends(get_db)):
+    # La versión del catálogo es una lectura por PK: si el cliente ya la
+    # tiene respondemos 304 sin cargar ni serializar productos
+    version = version_catalogo(db)
+    etag = catalog_cache.etag(version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    body = catalog_cache.get(version, ProductoService(db).get_all)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@productos_router.get(
+    "/productos/buscar",
+    response_model=list[Producto],
+    tags=["Productos"],
+    dependencies=[Depends(JWTBearer())]
+)
+def buscar_productos(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    # Búsqueda por código exacto, prefijo del nombre o aproximada (errores de tipeo)
+    return ProductoService(db).search(q, limit)
+
+@productos_router.get(
+    "/productos/stock-bajo",
+    response_model=list[Producto],
+    tags=["Productos"],
+    dependencies=[Depends(JWTBearer())]
+)
+def get_productos_stock_bajo(db: Session = Depends(get_db)):
+    # Servido desde el conjunto en memoria que mantiene el motor de alertas
+    return ProductoService(db).get_low_stock()
+
+@productos_router.get(
+    "/productos/changes",
+    response_model=ProductoCambios,
+    tags=["Productos"],
+    dependencies=[Depends(JWTBearer())]
+)
+def get_productos_changes(since: int = Query(0, ge=0), db: Session = Depends(get_db)):
+    # Sincronización delta: solo los productos que cambiaron después de `since`
+    return ProductoService(db).get_changes(since)
 
 @productos_router.get(
     "/productos/{id}",
@@ -32,8 +82,8 @@ def get_productos(db: Session = Depends(get_db)):
     tags=["Productos"],
     dependencies=[Depends(JWTBearer())]
 )
-def get_producto(id: int, db: Session = Depends(get_db)):
-    prod = ProductoService(db).get(id)
+async def get_producto(id: int, db: AsyncSession = Depends(get_async_db)):
+    prod = await AsyncProductoService(db).get(id)
     if not prod:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     return prod
@@ -62,13 +112,7 @@ async def create_producto(
     service = ProductoService(db)
     image_url = None
     if file:
-        if file.content_type not in ("image/jpeg", "image/png"):
-            raise HTTPException(status_code=400, detail="Solo JPEG o PNG")
-        name = f"{codigo}_{Path(file.filename).name}"
-        path = UPLOAD_DIR / name
-        with path.open("wb") as f:
-            f.write(await file.read())
-        image_url = f"/uploads/{name}"
+        image_url = await _procesar_imagen(file)
 
     payload = ProductoCreate(
         nombre=nombre,
@@ -83,7 +127,8 @@ async def create_producto(
         activo=activo,
         image_url=image_url,
     )
-    return service.create(payload)
+    # El servicio usa la sesión sync: se ejecuta en el threadpool, no en el event loop
+    return await run_in_threadpool(service.create, payload)
 
 @productos_router.put(
     "/productos/{id}",
@@ -107,7 +152,7 @@ async def update_producto(
     db: Session = Depends(get_db),
 ):
     service = ProductoService(db)
-    existing = service.get(id)
+    existing = await run_in_threadpool(service.get, id)
     if not existing:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
 
@@ -122,17 +167,10 @@ async def update_producto(
         if val is not None:
             data[fld] = val
 
-    updated = service.update(id, ProductoCreate(**data))
+    updated = await run_in_threadpool(service.update, id, ProductoCreate(**data))
 
     if file:
-        if file.content_type not in ("image/jpeg", "image/png"):
-            raise HTTPException(status_code=400, detail="Solo JPEG o PNG")
-        name = f"{id}_{Path(file.filename).name}"
-        path = UPLOAD_DIR / name
-        with path.open("wb") as f:
-            f.write(await file.read())
-        image_url = f"/uploads/{name}"
-        updated = service.set_image(id, image_url)
+        updated = await run_in_threadpool(service.set_image, id, await _procesar_imagen(file))
 
     return updated
 
@@ -157,24 +195,31 @@ async def upload_image(
     db: Session = Depends(get_db),
 ):
     service = ProductoService(db)
-    prod = service.get(id)
+    prod = await run_in_threadpool(service.get, id)
     if not prod:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
-    if file.content_type not in ("image/jpeg", "image/png"):
-        raise HTTPException(status_code=400, detail="Solo JPEG o PNG")
+    return await run_in_threadpool(service.set_image, id, await _procesar_imagen(file))
 
-    name = f"{id}_{Path(file.filename).name}"
-    path = UPLOAD_DIR / name
-    with path.open("wb") as f:
-        f.write(await file.read())
-    image_url = f"/uploads/{name}"
-    return service.set_image(id, image_url)
+@productos_router.post(
+    "/productos/importar-precios",
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Productos"],
+    dependencies=[Depends(JWTBearer())]
+)
+async def importar_precios(file: UploadFile = File(...)):
+    # La importación corre en segundo plano; el progreso se consulta por job_id
+    # y también se notifica por /ws/stock con el evento "import_progress"
+    data = await file.read()
+    job = await run_in_threadpool(import_jobs.submit, data, asyncio.get_running_loop())
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=job)
 
-@productos_router.post("/productos/importar-precios", tags=["Productos"], dependencies=[Depends(JWTBearer())])
-async def importar_precios(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-):
-    service = ProductoService(db)
-    updated, errors = service.bulk_update_prices_from_excel(await file.read())
-    return {"updated": updated, "errors": errors}
\ No newline at end of file
+@productos_router.get(
+    "/productos/importar-precios/{job_id}",
+    tags=["Productos"],
+    dependencies=[Depends(JWTBearer())]
+)
+def estado_importacion(job_id: str):
+    job = import_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    return job
\ No newline at end of file
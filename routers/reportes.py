@@ -0,0 +1,47 @@
+# routers/reportes.py
+
+from datetime import date
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from config.database import get_db
+from middlewares.jwt_bearer import JWTBearer
+from schemas.reporte import ReporteDiario, ReporteProducto, ReporteFormaPago, ReporteUsuario
+from services.reportes import ReporteService, reconstruir
+
+reportes_router = APIRouter(tags=["Reportes"], dependencies=[Depends(JWTBearer())])
+
+@reportes_router.get(
+    "/reportes/diario",
+    response_model=list[ReporteDiario]
+)
+def reporte_diario(desde: date | None = None, hasta: date | None = None, db: Session = Depends(get_db)):
+    return ReporteService(db).diario(desde, hasta)
+
+@reportes_router.get(
+    "/reportes/productos",
+    response_model=list[ReporteProducto]
+)
+def reporte_productos(desde: date | None = None, hasta: date | None = None, db: Session = Depends(get_db)):
+    return ReporteService(db).por_producto(desde, hasta)
+
+@reportes_router.get(
+    "/reportes/formas-pago",
+    response_model=list[ReporteFormaPago]
+)
+def reporte_formas_pago(desde: date | None = None, hasta: date | None = None, db: Session = Depends(get_db)):
+    return ReporteService(db).por_forma_pago(desde, hasta)
+
+@reportes_router.get(
+    "/reportes/usuarios",
+    response_model=list[ReporteUsuario]
+)
+def reporte_usuarios(desde: date | None = None, hasta: date | None = None, db: Session = Depends(get_db)):
+    return ReporteService(db).por_usuario(desde, hasta)
+
+@reportes_router.post("/reportes/reconstruir")
+def reconstruir_reportes(desde: date | None = None, hasta: date | None = None, db: Session = Depends(get_db)):
+    # Recalcula los resúmenes desde ventas y devoluciones (backfill)
+    filas = reconstruir(db, desde, hasta)
+    return {"filas": filas}
@@ -10,6 +10,7 @@ from services.usuarios import UsuariosService
 from schemas.usuarios import Usuarios, User
 from passlib.context import CryptContext
 from utils.jwt_manager import create_token
+from utils.user_cache import user_cache
 from typing import Optional
 
 usuarios_router = APIRouter()
@@ -92,7 +93,9 @@ def create_usuarios(
     db: Session = Depends(get_db)
 ):
     usuario.password = pwd_context.hash(usuario.password)
-    return UsuariosService(db).create_usuarios(usuario)
+    result = UsuariosService(db).create_usuarios(usuario)
+    user_cache.invalidate(result.username)
+    return result
 
 
 @usuarios_router.put(
@@ -146,7 +149,11 @@ def update_usuarios(
         password=new_password_hash,
     )
 
-    return UsuariosService(db).update_usuarios(id, usuario_in)
+    result = UsuariosService(db).update_usuarios(id, usuario_in)
+    # el username pudo cambiar: invalidamos el viejo y el nuevo
+    user_cache.invalidate(curr_username)
+    user_cache.invalidate(new_username)
+    return result
 
 @usuarios_router.delete(
     "/usuarios/{id}",
@@ -158,7 +165,10 @@ def delete_usuarios(
     id: int = Path(..., gt=0),
     db: Session = Depends(get_db)
 ):
-    if not db.query(UsuarioModel).filter(UsuarioModel.id == id).first():
+    existing = db.query(UsuarioModel).filter(UsuarioModel.id == id).first()
+    if not existing:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    username = existing.username
     UsuariosService(db).delete_usuarios(id)
+    user_cache.invalidate(username)
     return JSONResponse(status_code=204, content=None)
@@ -1,15 +1,19 @@
 # src/routers/ventas.py
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Response, status
 from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import Body
-from config.database import get_db
-from schemas.venta import Venta, VentaCreate, VentaPatch
-from services.ventas import VentaService
+from config.database import get_async_db, get_db
+from models.ventas import Venta as VentaModel
+from schemas.venta import Venta, VentaCompleta, VentaCreate, VentaPatch
+from services.ventas import AsyncVentaService, VentaService
 from middlewares.jwt_bearer import JWTBearer
 from utils.connection_manager import manager
-from models.productos import Producto as ProductoModel
+from utils.streaming import Formato, stream_response
 
 ventas_router = APIRouter()
 
@@ -19,8 +23,40 @@ ventas_router = APIRouter()
     tags=["Ventas"],
     dependencies=[Depends(JWTBearer())]
 )
-def get_ventas(db: Session = Depends(get_db)):
-    return VentaService(db).get_all()
+async def get_ventas(
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=500),
+    cursor: str | None = None,
+    desde: datetime | None = None,
+    hasta: datetime | None = None,
+    cliente_id: int | None = None,
+    usuario_id: int | None = None,
+    forma_pago: str | None = None,
+    pagado: bool | None = None,
+    formato: Formato = Query("json", alias="format"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if formato != "json":
+        # Exportación completa por streaming (ignora limit)
+        return stream_response(
+            lambda s: VentaService(s).query(
+                cursor=cursor, desde=desde, hasta=hasta, cliente_id=cliente_id,
+                usuario_id=usuario_id, forma_pago=forma_pago, pagado=pagado,
+            ),
+            Venta, formato, "ventas",
+            clave=(VentaModel.fecha, VentaModel.id), descendente=True,
+        )
+
+    # Sin filtros ni limit devuelve todas las ventas, como antes
+    ventas, next_cursor = await AsyncVentaService(db).get_page(
+        limit=limit, cursor=cursor, desde=desde, hasta=hasta,
+        cliente_id=cliente_id, usuario_id=usuario_id,
+        forma_pago=forma_pago, pagado=pagado,
+    )
+    # El cursor de la página siguiente viaja en un header para no cambiar el body
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return ventas
 
 @ventas_router.get(
     "/ventas/{id}",
@@ -28,8 +64,21 @@ def get_ventas(db: Session = Depends(get_db)):
     tags=["Ventas"],
     dependencies=[Depends(JWTBearer())]
 )
-def get_venta(id: int, db: Session = Depends(get_db)):
-    venta = VentaService(db).get(id)
+async def get_venta(id: int, db: AsyncSession = Depends(get_async_db)):
+    venta = await AsyncVentaService(db).get(id)
+    if not venta:
+        raise HTTPException(status_code=404, detail="Venta no encontrada")
+    return venta
+
+@ventas_router.get(
+    "/ventas/{id}/completa",
+    response_model=VentaCompleta,
+    tags=["Ventas"],
+    dependencies=[Depends(JWTBearer())]
+)
+async def get_venta_completa(id: int, db: AsyncSession = Depends(get_async_db)):
+    # Venta + líneas con nombre de producto + devoluciones, en una sola llamada
+    venta = await AsyncVentaService(db).get_completa(id)
     if not venta:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
     return venta
@@ -47,7 +96,7 @@ def create_venta(
     db: Session = Depends(get_db)
 ):
     try:
-        result = VentaService(db).create(venta)
+        result, nuevo_stock = VentaService(db).create_with_stock(venta)
 
         # Notificar nueva venta
         background_tasks.add_task(
@@ -66,18 +115,18 @@ def create_venta(
             "ventas"
         )
 
-        # Notificar stock actualizado
-        for d in venta.detalles:
-            prod = db.query(ProductoModel).filter(ProductoModel.id == d.producto_id).first()
-            background_tasks.add_task(
-                manager.broadcast,
-                {
-                    "event": "stock_update",
-                    "producto_id": prod.id,
-                    "new_stock": prod.stock_actual
-                },
-                "stock"
-            )
+        # Notificar stock actualizado (un solo evento con todos los productos)
+        background_tasks.add_task(
+            manager.broadcast,
+            {
+                "event": "stock_update",
+                "productos": [
+                    {"producto_id": pid, "new_stock": stock}
+                    for pid, stock in nuevo_stock.items()
+                ]
+            },
+            "stock"
+        )
 
         return result
 
@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from datetime import date
+
+class CajaFormaPago(BaseModel):
+    forma_pago: str
+    pagado: bool
+    ventas: int
+    bruto: float
+    descuentos: float
+    neto: float
+    devoluciones: float
+    saldo: float        # neto - devoluciones
+
+class CajaResumen(BaseModel):
+    desde: date | None = None
+    hasta: date | None = None
+    ventas: int
+    bruto: float
+    descuentos: float
+    neto: float
+    devoluciones: float
+    gastos: float
+    saldo: float        # neto - devoluciones - gastos
+    formas_pago: list[CajaFormaPago]
@@ -1,6 +1,8 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, computed_field
 from typing import Optional
 
+from utils.image_pipeline import variant_urls
+
 class ProductoBase(BaseModel):
     nombre: str
     codigo: str
@@ -33,5 +35,17 @@ class ProductoCreate(ProductoBase):
 class Producto(ProductoBase):
     id: int
 
+    @computed_field
+    @property
+    def imagenes(self) -> dict[str, dict[str, str]] | None:
+        # {"thumb"|"medium"|"large": {"webp": url, "jpg": url}}
+        return variant_urls(self.image_url)
+
     # Permite aceptar instancias de SQLAlchemy directamente
     model_config = ConfigDict(from_attributes=True)
+
+class ProductoCambios(BaseModel):
+    version: int = Field(..., description="Versión a enviar como 'since' en la próxima consulta")
+    productos: list[Producto] = []
+    eliminados: list[int] = []
+    completo: bool = Field(False, description="True si es el catálogo completo: reemplazar en vez de aplicar el delta")
@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+from datetime import date
+
+class ReporteDiario(BaseModel):
+    fecha: date
+    ventas: int
+    bruto: float
+    neto: float
+    costo: float
+    ganancia: float
+    monto_devuelto: float
+
+class ReporteProducto(BaseModel):
+    producto_id: int
+    cantidad: float
+    bruto: float
+    neto: float
+    costo: float
+    ganancia: float
+    cantidad_devuelta: float
+    monto_devuelto: float
+
+class ReporteFormaPago(BaseModel):
+    forma_pago: str
+    pagado: bool
+    ventas: int
+    bruto: float
+    neto: float
+
+class ReporteUsuario(BaseModel):
+    usuario_id: int
+    ventas: int
+    neto: float
+    costo: float
+    ganancia: float
@@ -2,6 +2,8 @@ from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional, List
 from datetime import datetime
 
+from schemas.devoluciones import DevolucionOut
+
 class DetalleVentaCreate(BaseModel):
     producto_id: int
     cantidad: float
@@ -41,3 +43,19 @@ class Venta(VentaBase):
 
 class VentaPatch(BaseModel):
     pagado: bool = Field(..., description="Marcar la venta como pagada o no")
+
+class DetalleVentaCompleta(BaseModel):
+    id: int
+    producto_id: int
+    producto_nombre: str | None
+    cantidad: float
+    precio_unitario: float
+    descuento_individual: float
+    subtotal: float
+    costo_unitario: float | None
+    cantidad_devuelta: float
+    cantidad_devolvible: float   # lo que todavía se puede devolver de la línea
+
+class VentaCompleta(Venta):
+    detalles: List[DetalleVentaCompleta]
+    devoluciones: List[DevolucionOut]
@@ -0,0 +1,158 @@
+# services/caja.py
+
+import csv
+from datetime import date, datetime, time, timedelta
+from io import BytesIO, StringIO
+from typing import Iterator
+
+from openpyxl import Workbook
+from sqlalchemy import func, literal, null, select, union_all
+from sqlalchemy.orm import Session
+
+from models.ventas import Venta as VentaModel
+from models.devoluciones import Devolucion, DetalleDevolucion
+from models.gastos import Gasto as GastoModel
+from schemas.caja import CajaFormaPago, CajaResumen
+
+COLUMNAS = ["forma_pago", "pagado", "ventas", "bruto", "descuentos", "neto", "devoluciones", "saldo"]
+
+
+def _rango(stmt, columna, desde: date | None, hasta: date | None):
+    # Filtro por días completos sobre columnas DateTime (usa los índices por fecha)
+    if desde is not None:
+        stmt = stmt.where(columna >= datetime.combine(desde, time.min))
+    if hasta is not None:
+        stmt = stmt.where(columna < datetime.combine(hasta + timedelta(days=1), time.min))
+    return stmt
+
+
+class CajaService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def resumen(self, desde: date | None = None, hasta: date | None = None) -> CajaResumen:
+        """
+        Cierre de caja del rango: ventas, descuentos y devoluciones por
+        forma_pago/pagado, más los gastos. Todo se agrega en la base con un
+        único SELECT (UNION ALL de tres consultas agrupadas).
+        """
+        ventas = _rango(
+            select(
+                literal("venta").label("tipo"),
+                VentaModel.forma_pago.label("forma_pago"),
+                VentaModel.pagado.label("pagado"),
+                func.count(VentaModel.id).label("cantidad"),
+                func.sum(VentaModel.total_sin_descuento).label("bruto"),
+                func.sum(VentaModel.total).label("monto"),
+            ),
+            VentaModel.fecha, desde, hasta,
+        ).group_by(VentaModel.forma_pago, VentaModel.pagado)
+
+        # Devoluciones por fecha de la devolución, imputadas a la forma de pago de la venta original
+        devoluciones = _rango(
+            select(
+                literal("devolucion").label("tipo"),
+                VentaModel.forma_pago,
+                VentaModel.pagado,
+                func.count(func.distinct(Devolucion.id)),
+                null(),
+                func.sum(DetalleDevolucion.subtotal),
+            )
+            .select_from(DetalleDevolucion)
+            .join(Devolucion, Devolucion.id == DetalleDevolucion.devolucion_id)
+            .join(VentaModel, VentaModel.id == Devolucion.venta_id),
+            Devolucion.fecha, desde, hasta,
+        ).group_by(VentaModel.forma_pago, VentaModel.pagado)
+
+        gastos = _rango(
+            select(
+                literal("gasto").label("tipo"),
+                null(),
+                null(),
+                func.count(GastoModel.id),
+                null(),
+                func.sum(GastoModel.monto),
+            ),
+            GastoModel.fecha, desde, hasta,
+        )
+
+        grupos: dict[tuple[str, bool], dict] = {}
+        total_gastos = 0.0
+        for tipo, forma_pago, pagado, cantidad, bruto, monto in self.db.execute(union_all(ventas, devoluciones, gastos)):
+            if tipo == "gasto":
+                total_gastos = monto or 0.0
+                continue
+            g = grupos.setdefault(
+                (forma_pago, bool(pagado)),
+                {"ventas": 0, "bruto": 0.0, "neto": 0.0, "devoluciones": 0.0},
+            )
+            if tipo == "venta":
+                g["ventas"] = cantidad or 0
+                g["bruto"] = bruto or 0.0
+                g["neto"] = monto or 0.0
+            else:
+                g["devoluciones"] = monto or 0.0
+
+        formas_pago = [
+            CajaFormaPago(
+                forma_pago=forma_pago,
+                pagado=pagado,
+                ventas=g["ventas"],
+                bruto=g["bruto"],
+                descuentos=g["bruto"] - g["neto"],
+                neto=g["neto"],
+                devoluciones=g["devoluciones"],
+                saldo=g["neto"] - g["devoluciones"],
+            )
+            for (forma_pago, pagado), g in sorted(grupos.items())
+        ]
+        bruto = sum(f.bruto for f in formas_pago)
+        neto = sum(f.neto for f in formas_pago)
+        devuelto = sum(f.devoluciones for f in formas_pago)
+        return CajaResumen(
+            desde=desde,
+            hasta=hasta,
+            ventas=sum(f.ventas for f in formas_pago),
+            bruto=bruto,
+            descuentos=bruto - neto,
+            neto=neto,
+            devoluciones=devuelto,
+            gastos=total_gastos,
+            saldo=neto - devuelto - total_gastos,
+            formas_pago=formas_pago,
+        )
+
+
+def _filas(resumen: CajaResumen) -> Iterator[list]:
+    # Mismo desglose para CSV y Excel: una fila por forma de pago, total y gastos
+    yield COLUMNAS
+    for f in resumen.formas_pago:
+        yield [f.forma_pago, "si" if f.pagado else "no", f.ventas, round(f.bruto, 2),
+               round(f.descuentos, 2), round(f.neto, 2), round(f.devoluciones, 2), round(f.saldo, 2)]
+    yield ["TOTAL", "", resumen.ventas, round(resumen.bruto, 2), round(resumen.descuentos, 2),
+           round(resumen.neto, 2), round(resumen.devoluciones, 2), round(resumen.neto - resumen.devoluciones, 2)]
+    yield ["GASTOS", "", "", "", "", "", "", round(-resumen.gastos, 2)]
+    yield ["SALDO", "", "", "", "", "", "", round(resumen.saldo, 2)]
+
+
+def exportar_csv(resumen: CajaResumen) -> Iterator[str]:
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    for fila in _filas(resumen):
+        writer.writerow(fila)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def exportar_xlsx(resumen: CajaResumen, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    # write_only no mantiene las celdas en memoria; el archivo se envía por partes
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Caja")
+    for fila in _filas(resumen):
+        ws.append(fila)
+    out = BytesIO()
+    wb.save(out)
+    out.seek(0)
+    while chunk := out.read(chunk_size):
+        yield chunk
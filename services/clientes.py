@@ -9,6 +9,10 @@ class ClienteService:
         result = self.db.query(ClienteModel).all()
         return [Cliente.model_validate(c) for c in result]
 
+    def query(self):
+        # Consulta ordenada, sin ejecutar (para exportar por streaming)
+        return self.db.query(ClienteModel).order_by(ClienteModel.id)
+
     def create(self, cliente: ClienteCreate):
         new_cliente = ClienteModel(**cliente.dict())
         self.db.add(new_cliente)
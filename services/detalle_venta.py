@@ -9,6 +9,10 @@ class DetalleVentaService:
         result = self.db.query(DetalleVentaModel).all()
         return [DetalleVenta.model_validate(d) for d in result]
 
+    def query(self):
+        # Consulta ordenada, sin ejecutar (para exportar por streaming)
+        return self.db.query(DetalleVentaModel).order_by(DetalleVentaModel.id)
+
     def create(self, detalle: DetalleVentaCreate):
         new_detalle = DetalleVentaModel(**detalle.dict())
         self.db.add(new_detalle)
@@ -1,12 +1,169 @@
 # services/devoluciones.py
 
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from datetime import datetime
+
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import and_, case, func, insert, or_, select, update
 import models.devoluciones as devol_models
 import models.ventas as ventas_models
 import models.productos as productos_models
 import models.detalle_venta as dv_models
 from schemas.devoluciones import DevolucionCreate
+from services.reportes import acumular, aportes_devolucion
+from services.productos import registrar_cambios
+from utils.cursor import decode_cursor, encode_cursor, fecha_keyset
+from utils.stock_alerts import CambioStock, stock_alerts
+
+
+def _totales_por_producto(db: Session, venta_id: int) -> dict[int, tuple[float, float]]:
+    """
+    En una sola consulta: {producto_id: (vendido, devuelto)} para toda la venta.
+    """
+    vendido = (
+        select(
+            dv_models.DetalleVenta.producto_id.label("producto_id"),
+            func.sum(dv_models.DetalleVenta.cantidad).label("cantidad"),
+        )
+        .where(dv_models.DetalleVenta.venta_id == venta_id)
+        .group_by(dv_models.DetalleVenta.producto_id)
+        .subquery()
+    )
+    devuelto = (
+        select(
+            devol_models.DetalleDevolucion.producto_id.label("producto_id"),
+            func.sum(devol_models.DetalleDevolucion.cantidad).label("cantidad"),
+        )
+        .join(devol_models.Devolucion)
+        .where(devol_models.Devolucion.venta_id == venta_id)
+        .group_by(devol_models.DetalleDevolucion.producto_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(vendido.c.producto_id, vendido.c.cantidad, func.coalesce(devuelto.c.cantidad, 0))
+        .outerjoin(devuelto, devuelto.c.producto_id == vendido.c.producto_id)
+    ).all()
+    return {pid: (sold or 0, returned or 0) for pid, sold, returned in rows}
+
+
+def _validar_limites(db: Session, venta_id: int, data: DevolucionCreate) -> dict[int, int]:
+    """
+    Valida que no se devuelva más de lo vendido y devuelve las cantidades
+    pedidas agrupadas por producto.
+    """
+    pedidos: dict[int, int] = {}
+    for item in data.items:
+        pedidos[item.producto_id] = pedidos.get(item.producto_id, 0) + item.cantidad
+
+    totales = _totales_por_producto(db, venta_id)
+    for producto_id, cantidad in pedidos.items():
+        sold_qty, returned_qty = totales.get(producto_id, (0, 0))
+        if returned_qty + cantidad > sold_qty:
+            disponible = sold_qty - returned_qty
+            raise ValueError(
+                f"No puedes devolver {cantidad} unidades del producto {producto_id}; "
+                f"solo quedan {disponible} disponibles"
+            )
+    return pedidos
+
+
+def _lineas_originales(db: Session, venta_id: int) -> dict[int, dv_models.DetalleVenta]:
+    """
+    Todas las líneas de la venta en una consulta, la primera por producto.
+    """
+    lineas: dict[int, dv_models.DetalleVenta] = {}
+    for linea in (
+        db.query(dv_models.DetalleVenta)
+        .filter(dv_models.DetalleVenta.venta_id == venta_id)
+        .order_by(dv_models.DetalleVenta.id)
+    ):
+        lineas.setdefault(linea.producto_id, linea)
+    return lineas
+
+
+def _bloquear_productos(db: Session, ids) -> dict[int, productos_models.Producto]:
+    """
+    Trae y bloquea los productos en una consulta, en orden de id para evitar deadlocks.
+    """
+    if not ids:
+        return {}
+    return {
+        p.id: p
+        for p in (
+            db.query(productos_models.Producto)
+            .filter(productos_models.Producto.id.in_(sorted(ids)))
+            .order_by(productos_models.Producto.id)
+            .with_for_update()
+            .all()
+        )
+    }
+
+
+def _ajustar_stock(
+    db: Session,
+    productos: dict[int, productos_models.Producto],
+    deltas: dict[int, int],
+) -> list[CambioStock]:
+    """
+    Suma cada delta al stock_actual con un único UPDATE y devuelve los cambios
+    (stock anterior y nuevo) para las alertas de stock bajo.
+    """
+    deltas = {pid: d for pid, d in deltas.items() if d and pid in productos}
+    if not deltas:
+        return []
+    Producto = productos_models.Producto
+    db.execute(
+        update(Producto)
+        .where(Producto.id.in_(deltas))
+        .values(stock_actual=func.coalesce(Producto.stock_actual, 0) + case(deltas, value=Producto.id))
+        .execution_options(synchronize_session=False)
+    )
+    cambios: list[CambioStock] = []
+    for pid, delta in deltas.items():
+        prod = productos[pid]
+        antes = prod.stock_actual or 0
+        set_committed_value(prod, "stock_actual", antes + delta)
+        cambios.append((pid, antes, prod.stock_bajo, antes + delta, prod.stock_bajo))
+    registrar_cambios(db, deltas)
+    return cambios
+
+
+def _crear_detalles(
+    db: Session,
+    devolucion_id: int,
+    venta_id: int,
+    data: DevolucionCreate,
+) -> list[tuple[int, int, float]]:
+    """
+    Crea los detalles usando precio_unitario y descuento_individual de la venta original.
+    Devuelve (producto_id, cantidad, subtotal) de cada línea para los reportes.
+    """
+    creados: list[tuple[int, int, float]] = []
+    filas: list[dict] = []
+    lineas = _lineas_originales(db, venta_id)
+    for item in data.items:
+        orig = lineas.get(item.producto_id)
+        if not orig:
+            raise ValueError(f"Detalle de venta no encontrado para producto {item.producto_id}")
+
+        pu = orig.precio_unitario
+        di = getattr(orig, 'descuento_individual', 0.0)
+        # Subtotal de devolución con descuento_individual
+        sub = pu * item.cantidad * (1 - di/100)
+
+        filas.append(dict(
+            devolucion_id         = devolucion_id,
+            producto_id           = item.producto_id,
+            cantidad              = item.cantidad,
+            precio_unitario       = pu,
+            descuento_individual  = di,
+            subtotal              = sub
+        ))
+        creados.append((item.producto_id, item.cantidad, sub))
+    # Un solo INSERT (executemany): los ids no se necesitan, el refresh final trae los detalles
+    if filas:
+        db.execute(insert(devol_models.DetalleDevolucion.__table__), filas)
+    return creados
 
 
 def create_devolucion(db: Session, data: DevolucionCreate) -> devol_models.Devolucion:
@@ -21,24 +178,8 @@ def create_devolucion(db: Session, data: DevolucionCreate) -> devol_models.Devol
     if not venta:
         raise ValueError("Venta no encontrada")
 
-    # 2) Validar límite de devolución
-    for item in data.items:
-        sold_qty = db.query(func.coalesce(func.sum(dv_models.DetalleVenta.cantidad), 0)).filter(
-            dv_models.DetalleVenta.venta_id == data.venta_id,
-            dv_models.DetalleVenta.producto_id == item.producto_id
-        ).scalar() or 0
-        returned_qty = db.query(func.coalesce(func.sum(devol_models.DetalleDevolucion.cantidad), 0)).join(
-            devol_models.Devolucion
-        ).filter(
-            devol_models.Devolucion.venta_id == data.venta_id,
-            devol_models.DetalleDevolucion.producto_id == item.producto_id
-        ).scalar() or 0
-        if returned_qty + item.cantidad > sold_qty:
-            disponible = sold_qty - returned_qty
-            raise ValueError(
-                f"No puedes devolver {item.cantidad} unidades del producto {item.producto_id}; "
-                f"solo quedan {disponible} disponibles"
-            )
+    # 2) Validar límite de devolución (una consulta agrupada para toda la venta)
+    pedidos = _validar_limites(db, data.venta_id, data)
 
     # 3) Crear cabecera
     nueva_dev = devol_models.Devolucion(
@@ -50,46 +191,23 @@ def create_devolucion(db: Session, data: DevolucionCreate) -> devol_models.Devol
     db.flush()
 
     # 4) Crear detalles usando datos de la venta original
-    for item in data.items:
-        # 4.1) Obtener detalle de venta original
-        orig = (
-            db.query(dv_models.DetalleVenta)
-            .filter(
-                dv_models.DetalleVenta.venta_id == data.venta_id,
-                dv_models.DetalleVenta.producto_id == item.producto_id
-            )
-            .first()
-        )
-        if not orig:
-            raise ValueError(f"Detalle de venta no encontrado para producto {item.producto_id}")
+    creados = _crear_detalles(db, nueva_dev.id, data.venta_id, data)
 
-        pu = orig.precio_unitario
-        di = getattr(orig, 'descuento_individual', 0.0)
-        # 4.2) Calcular subtotal de devolución con descuento_individual
-        sub = pu * item.cantidad * (1 - di/100)
+    # 5) Ajustar stock (solo si reponer_stock es True)
+    cambios: list[CambioStock] = []
+    if data.reponer_stock:
+        productos = _bloquear_productos(db, pedidos)
+        faltantes = sorted(set(pedidos) - set(productos))
+        if faltantes:
+            raise ValueError(f"Producto {faltantes[0]} no encontrado")
+        cambios = _ajustar_stock(db, productos, pedidos)
 
-        detalle = devol_models.DetalleDevolucion(
-            devolucion_id         = nueva_dev.id,
-            producto_id           = item.producto_id,
-            cantidad              = item.cantidad,
-            precio_unitario       = pu,
-            descuento_individual  = di,
-            subtotal              = sub
-        )
-        db.add(detalle)
-
-        # 4.3) Ajustar stock (solo si reponer_stock es True)
-        if data.reponer_stock:
-            producto = db.query(productos_models.Producto).filter(
-                productos_models.Producto.id == item.producto_id
-            ).first()
-            if not producto:
-                raise ValueError(f"Producto {item.producto_id} no encontrado")
-            producto.stock_actual = (producto.stock_actual or 0) + item.cantidad
-            db.add(producto)
-
-    # 5) Guardar todo
+    # Reportes después del stock: mismo orden de locks que las ventas (productos, luego rollup)
+    acumular(db, aportes_devolucion(nueva_dev.fecha, creados))
+
+    # 6) Guardar todo
     db.commit()
+    stock_alerts.observe(cambios)
     db.refresh(nueva_dev)
     return nueva_dev
 
@@ -105,21 +223,21 @@ def update_devolucion(db: Session, devolucion_id: int, data: DevolucionCreate) -
     if not devol:
         raise ValueError("Devolución no encontrada")
 
-    # 1) Revertir stock y borrar detalles previos
-    # Solo revertimos (restamos lo devuelto) si la devolución anterior había repuesto stock.
+    # Líneas anteriores, para descontarlas de los reportes
+    anteriores = [(d.producto_id, d.cantidad, d.subtotal) for d in devol.detalles]
+
+    # Stock a revertir: solo si la devolución anterior había repuesto stock
+    deltas: dict[int, int] = {}
     if devol.reponer_stock:
         for detalle in devol.detalles:
-            prod = db.query(productos_models.Producto).filter(
-                productos_models.Producto.id == detalle.producto_id
-            ).first()
-            if prod:
-                prod.stock_actual = (prod.stock_actual or 0) - detalle.cantidad
-                db.add(prod)
-    
-    # Borrar detalles viejos
-    for detalle in devol.detalles:
-        db.delete(detalle)
-    db.flush()
+            deltas[detalle.producto_id] = deltas.get(detalle.producto_id, 0) - detalle.cantidad
+
+    # 1) Borrar detalles viejos en una sola sentencia y olvidar la colección
+    # cargada, para que el refresh final traiga solo los detalles nuevos
+    db.query(devol_models.DetalleDevolucion).filter(
+        devol_models.DetalleDevolucion.devolucion_id == devol.id
+    ).delete(synchronize_session=False)
+    db.expire(devol, ["detalles"])
 
     # Actualizamos el flag en la cabecera
     devol.reponer_stock = data.reponer_stock
@@ -127,61 +245,27 @@ def update_devolucion(db: Session, devolucion_id: int, data: DevolucionCreate) -
     db.add(devol)
 
     # 2) Validar nuevo límite de devolución
-    for item in data.items:
-        sold_qty = db.query(func.coalesce(func.sum(dv_models.DetalleVenta.cantidad), 0)).filter(
-            dv_models.DetalleVenta.venta_id == devol.venta_id,
-            dv_models.DetalleVenta.producto_id == item.producto_id
-        ).scalar() or 0
-        returned_qty = db.query(func.coalesce(func.sum(devol_models.DetalleDevolucion.cantidad), 0)).join(
-            devol_models.Devolucion
-        ).filter(
-            devol_models.Devolucion.venta_id == devol.venta_id,
-            devol_models.DetalleDevolucion.producto_id == item.producto_id
-        ).scalar() or 0
-        if returned_qty + item.cantidad > sold_qty:
-            disp = sold_qty - returned_qty
-            raise ValueError(
-                f"No puedes devolver {item.cantidad} unidades del producto {item.producto_id}; "
-                f"solo quedan {disp} disponibles"
-            )
+    pedidos = _validar_limites(db, devol.venta_id, data)
 
     # 3) Crear nuevos detalles con precio y descuento
-    for item in data.items:
-        orig = (
-            db.query(dv_models.DetalleVenta)
-            .filter(
-                dv_models.DetalleVenta.venta_id == devol.venta_id,
-                dv_models.DetalleVenta.producto_id == item.producto_id
-            )
-            .first()
-        )
-        if not orig:
-            raise ValueError(f"Detalle de venta no encontrado para producto {item.producto_id}")
+    creados = _crear_detalles(db, devol.id, devol.venta_id, data)
 
-        pu = orig.precio_unitario
-        di = getattr(orig, 'descuento_individual', 0.0)
-        sub = pu * item.cantidad * (1 - di/100)
+    # 4) Revertir lo anterior y aplicar lo nuevo en un único ajuste de stock
+    if data.reponer_stock:
+        for producto_id, cantidad in pedidos.items():
+            deltas[producto_id] = deltas.get(producto_id, 0) + cantidad
+    productos = _bloquear_productos(db, deltas)
+    if data.reponer_stock:
+        faltantes = sorted(set(pedidos) - set(productos))
+        if faltantes:
+            raise ValueError(f"Producto {faltantes[0]} no encontrado")
+    cambios = _ajustar_stock(db, productos, deltas)
 
-        nuevo_detalle = devol_models.DetalleDevolucion(
-            devolucion_id         = devol.id,
-            producto_id           = item.producto_id,
-            cantidad              = item.cantidad,
-            precio_unitario       = pu,
-            descuento_individual  = di,
-            subtotal              = sub
-        )
-        db.add(nuevo_detalle)
-
-        db.add(nuevo_detalle)
-
-        if data.reponer_stock:
-            prod = db.query(productos_models.Producto).filter(
-                productos_models.Producto.id == item.producto_id
-            ).first()
-            prod.stock_actual = (prod.stock_actual or 0) + item.cantidad
-            db.add(prod)
+    # 5) Reportes después del stock (productos, luego rollup)
+    acumular(db, aportes_devolucion(devol.fecha, anteriores, -1) + aportes_devolucion(devol.fecha, creados))
 
     db.commit()
+    stock_alerts.observe(cambios)
     db.refresh(devol)
     return devol
 
@@ -189,14 +273,57 @@ def get_all_devoluciones(db: Session) -> list[devol_models.Devolucion]:
     """
     Devuelve todas las devoluciones registradas.
     """
-    return db.query(devol_models.Devolucion).order_by(devol_models.Devolucion.fecha.desc(), devol_models.Devolucion.id.desc()).all()
+    devoluciones, _ = get_devoluciones_page(db)
+    return devoluciones
+
+
+def get_devoluciones_page(
+    db: Session,
+    limit: int | None = None,
+    cursor: str | None = None,
+    desde: datetime | None = None,
+    hasta: datetime | None = None,
+    venta_id: int | None = None,
+) -> tuple[list[devol_models.Devolucion], str | None]:
+    """
+    Historial filtrado con paginación keyset sobre (fecha desc, id desc).
+    Los detalles se cargan con selectinload: dos consultas por página,
+    sin importar cuántas devoluciones traiga.
+    """
+    Dev = devol_models.Devolucion
+    q = db.query(Dev).options(selectinload(Dev.detalles))
+    if desde is not None:
+        q = q.filter(Dev.fecha >= desde)
+    if hasta is not None:
+        q = q.filter(Dev.fecha <= hasta)
+    if venta_id is not None:
+        q = q.filter(Dev.venta_id == venta_id)
+    fecha = fecha_keyset(Dev.fecha)
+    if cursor:
+        c_fecha, c_id = decode_cursor(cursor)
+        q = q.filter(or_(fecha < fecha_keyset(c_fecha), and_(fecha == fecha_keyset(c_fecha), Dev.id < c_id)))
+
+    q = q.order_by(fecha.desc(), Dev.id.desc())
+    if limit is None:
+        return q.all(), None
+
+    # Una fila extra indica si hay página siguiente
+    devoluciones = q.limit(limit + 1).all()
+    next_cursor = None
+    if len(devoluciones) > limit:
+        devoluciones = devoluciones[:limit]
+        last = devoluciones[-1]
+        next_cursor = encode_cursor(last.fecha, last.id)
+    return devoluciones, next_cursor
 
 
 def get_devolucion_by_id(db: Session, devolucion_id: int) -> devol_models.Devolucion | None:
     """
     Obtiene una devolución por su ID.
     """
-    return db.query(devol_models.Devolucion).filter(
+    return db.query(devol_models.Devolucion).options(
+        selectinload(devol_models.Devolucion.detalles)
+    ).filter(
         devol_models.Devolucion.id == devolucion_id
     ).first()
     
@@ -211,17 +338,20 @@ def delete_devolucion(db: Session, devolucion_id: int) -> None:
         raise ValueError("Devolución no encontrada")
 
     # Revertir stock_actual (si aplicaba) y eliminar detalles
+    cambios: list[CambioStock] = []
     if devol.reponer_stock:
+        deltas: dict[int, int] = {}
         for detalle in devol.detalles:
-            producto = db.query(productos_models.Producto).filter(
-                productos_models.Producto.id == detalle.producto_id
-            ).first()
-            if producto:
-                producto.stock_actual = (producto.stock_actual or 0) - detalle.cantidad
-                db.add(producto)
+            deltas[detalle.producto_id] = deltas.get(detalle.producto_id, 0) - detalle.cantidad
+        cambios = _ajustar_stock(db, _bloquear_productos(db, deltas), deltas)
+
+    acumular(db, aportes_devolucion(
+        devol.fecha, [(d.producto_id, d.cantidad, d.subtotal) for d in devol.detalles], -1
+    ))
 
     db.query(devol_models.DetalleDevolucion).filter(
         devol_models.DetalleDevolucion.devolucion_id == devolucion_id
     ).delete()
     db.delete(devol)
-    db.commit()
\ No newline at end of file
+    db.commit()
+    stock_alerts.observe(cambios)
@@ -15,6 +15,10 @@ class GastoService:
         gastos = self.db.query(GastoModel).order_by(GastoModel.fecha.desc()).all()
         return [Gasto.model_validate(g) for g in gastos]
 
+    def query(self):
+        # Consulta ordenada, sin ejecutar (para exportar por streaming)
+        return self.db.query(GastoModel).order_by(GastoModel.fecha.desc(), GastoModel.id.desc())
+
     def get(self, id: int) -> Gasto | None:
         g = self.db.query(GastoModel).filter(GastoModel.id == id).first()
         return Gasto.model_validate(g) if g else None
@@ -0,0 +1,90 @@
+# src/services/migraciones.py
+
+import sys
+
+from sqlalchemy import Engine, Index, inspect, text
+from sqlalchemy.schema import CreateIndex
+
+from config.database import Base
+
+def _importar_modelos() -> None:
+    # Registra todas las tablas en Base.metadata (main lo hace vía los routers)
+    import models.categorias, models.clientes, models.detalle_venta, models.devoluciones  # noqa: F401
+    import models.gastos, models.productos, models.reportes, models.usuarios, models.ventas  # noqa: F401
+
+def indices_faltantes(engine: Engine) -> list[Index]:
+    """
+    Índices declarados en los modelos que no existen en tablas ya creadas.
+    create_all solo crea tablas nuevas: a las existentes no les agrega índices.
+    Se omite un índice si ya hay otro con las mismas columnas (p. ej. el que
+    MySQL crea para una FK).
+    """
+    _importar_modelos()
+    insp = inspect(engine)
+    faltantes = []
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue   # la crea create_all, con sus índices
+        existentes = insp.get_indexes(table.name)
+        nombres = {ix["name"] for ix in existentes}
+        columnas = {tuple(ix["column_names"]) for ix in existentes}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            cols = tuple(c.name for c in index.columns)
+            if index.name not in nombres and cols not in columnas:
+                faltantes.append(index)
+    return faltantes
+
+def _columnas_faltantes(engine: Engine) -> list[str]:
+    insp = inspect(engine)
+    sentencias = []
+    if insp.has_table("productos_cambios"):
+        columnas = {c["name"] for c in insp.get_columns("productos_cambios")}
+        if "version" not in columnas:
+            # Los cambios previos conservan su id como versión
+            sentencias += [
+                "ALTER TABLE productos_cambios ADD COLUMN version INTEGER NOT NULL DEFAULT 0",
+                "UPDATE productos_cambios SET version = id",
+            ]
+    return sentencias
+
+def _semillas(engine: Engine) -> list[str]:
+    insp = inspect(engine)
+    if insp.has_table("catalogo_version"):
+        with engine.connect() as conn:
+            if conn.execute(text("SELECT 1 FROM catalogo_version WHERE id = 1")).first():
+                return []
+    # El contador arranca en la última versión registrada
+    return [
+        "INSERT INTO catalogo_version (id, version) "
+        "SELECT 1, COALESCE(MAX(version), 0) FROM productos_cambios"
+    ]
+
+def migrar(engine: Engine, solo_sql: bool = False) -> list[str]:
+    """
+    Lleva una base existente al esquema de los modelos: tablas nuevas,
+    columnas agregadas, índices faltantes y filas iniciales.
+    Devuelve el DDL (con solo_sql no ejecuta nada).
+    """
+    _importar_modelos()
+    if not solo_sql:
+        Base.metadata.create_all(bind=engine)
+    sentencias = _columnas_faltantes(engine)
+    sentencias += [str(CreateIndex(index).compile(engine)) for index in indices_faltantes(engine)]
+    sentencias += _semillas(engine)
+    if not solo_sql:
+        with engine.begin() as conn:
+            for sentencia in sentencias:
+                conn.execute(text(sentencia))
+    return sentencias
+
+
+if __name__ == "__main__":
+    # python -m services.migraciones [--sql]   (--sql: solo muestra el DDL)
+    from config.database import engine
+
+    solo_sql = "--sql" in sys.argv[1:]
+    ddl = migrar(engine, solo_sql)
+    for sentencia in ddl:
+        print(f"{sentencia};")
+    if not ddl:
+        print("Sin cambios: el esquema ya está al día")
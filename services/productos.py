@@ -1,13 +1,79 @@
 # src/services/productos.py
 
+from datetime import datetime, timedelta
+from typing import Callable
+
 from fastapi import HTTPException, status
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from io import BytesIO
 from openpyxl import load_workbook
 
-from models.productos import Producto as ProductoModel
-from schemas.producto import Producto, ProductoCreate
+from models.productos import CatalogoVersion, Producto as ProductoModel, ProductoCambio
+from schemas.producto import Producto, ProductoCambios, ProductoCreate
+from utils.search_index import search_index
+from utils.stock_alerts import stock_alerts
+
+def registrar_cambios(db: Session, ids) -> None:
+    """
+    Anota en productos_cambios los productos modificados, dentro de la
+    misma transacción que el cambio (el commit lo hace quien llama).
+    Llamar después de bloquear/actualizar los productos: el orden de locks
+    es productos, contador de versión y luego filas de reporte.
+    """
+    ids = sorted(set(ids))
+    if ids:
+        # Con autoflush=False los UPDATE de productos pendientes saldrían recién
+        # en el commit, después de bloquear el contador: se mandan antes
+        db.flush()
+        version = _siguiente_version(db)
+        db.execute(insert(ProductoCambio), [{"producto_id": pid, "version": version} for pid in ids])
+
+def _siguiente_version(db: Session) -> int:
+    # El UPDATE deja la fila bloqueada hasta el commit: las versiones se confirman en orden.
+    # Todas las escrituras del catálogo se serializan en esta fila hasta su commit.
+    stmt = (
+        update(CatalogoVersion)
+        .where(CatalogoVersion.id == 1)
+        .values(version=CatalogoVersion.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if db.execute(stmt).rowcount == 0:
+        # Sin fila del contador (se siembra al arrancar): crearla y reintentar
+        try:
+            with db.begin_nested():
+                db.execute(insert(CatalogoVersion).values(id=1, version=0))
+        except IntegrityError:
+            pass   # la creó otra transacción concurrente
+        db.execute(stmt)
+    return db.scalar(select(CatalogoVersion.version).where(CatalogoVersion.id == 1))
+
+def asegurar_version_catalogo(db: Session) -> None:
+    """Crea la fila del contador si falta, desde la última versión registrada."""
+    if db.get(CatalogoVersion, 1) is not None:
+        return
+    ultima = db.scalar(select(func.coalesce(func.max(ProductoCambio.version), 0)))
+    try:
+        db.add(CatalogoVersion(id=1, version=ultima))
+        db.commit()
+    except IntegrityError:
+        db.rollback()   # otro worker la creó al mismo tiempo
+
+def version_catalogo(db: Session) -> int:
+    """Versión confirmada del catálogo (0 si todavía no hubo cambios)."""
+    return db.scalar(select(CatalogoVersion.version).where(CatalogoVersion.id == 1)) or 0
+
+def purgar_cambios(db: Session, dias: int) -> int:
+    """
+    Borra del registro los cambios de más de `dias` días. Un cliente con un
+    `since` anterior a lo que queda recibe el catálogo completo.
+    """
+    limite = datetime.now() - timedelta(days=dias)
+    res = db.execute(delete(ProductoCambio).where(ProductoCambio.fecha < limite))
+    db.commit()
+    return res.rowcount
 
 class ProductoService:
     model = ProductoModel
@@ -19,6 +85,65 @@ class ProductoService:
         prods = self.db.query(ProductoModel).all()
         return [Producto.model_validate(p) for p in prods]
 
+    def get_changes(self, since: int) -> ProductoCambios:
+        """
+        Productos modificados después de la versión `since`.
+        Con since=0, o si los cambios posteriores a `since` ya se purgaron,
+        devuelve el catálogo completo (completo=True).
+        """
+        version = version_catalogo(self.db)
+        if since > version:
+            # Cliente con una versión que esta base no emitió (p. ej. base restaurada)
+            since = 0
+        if since > 0 and since < version:
+            # Las versiones son consecutivas: si falta since+1 se purgó parte del delta
+            primera = self.db.scalar(
+                select(func.min(ProductoCambio.version)).where(ProductoCambio.version > since)
+            )
+            if primera != since + 1:
+                since = 0
+        if since <= 0:
+            return ProductoCambios(version=version, productos=self.get_all(), completo=True)
+
+        ids = [
+            pid for (pid,) in
+            self.db.query(ProductoCambio.producto_id)
+            .filter(ProductoCambio.version > since, ProductoCambio.version <= version)
+            .distinct()
+        ]
+        prods = self.db.query(ProductoModel).filter(ProductoModel.id.in_(ids)).all() if ids else []
+        encontrados = {p.id for p in prods}
+        return ProductoCambios(
+            version=version,
+            productos=[Producto.model_validate(p) for p in prods],
+            eliminados=[pid for pid in ids if pid not in encontrados],
+        )
+
+    def search(self, q: str, limit: int = 20) -> list[Producto]:
+        search_index.ensure_built(
+            lambda: self.db.query(ProductoModel.id, ProductoModel.nombre, ProductoModel.codigo).all()
+        )
+        ids = search_index.search(q, limit)
+        if not ids:
+            return []
+        prods = {
+            p.id: p
+            for p in self.db.query(ProductoModel).filter(ProductoModel.id.in_(ids))
+        }
+        return [Producto.model_validate(prods[i]) for i in ids if i in prods]
+
+    def get_low_stock(self) -> list[Producto]:
+        stock_alerts.ensure_built(
+            lambda: self.db.query(
+                ProductoModel.id, ProductoModel.stock_actual, ProductoModel.stock_bajo
+            ).filter(ProductoModel.stock_actual <= ProductoModel.stock_bajo).all()
+        )
+        ids = stock_alerts.low_stock_ids()
+        if not ids:
+            return []
+        prods = self.db.query(ProductoModel).filter(ProductoModel.id.in_(ids)).order_by(ProductoModel.id)
+        return [Producto.model_validate(p) for p in prods]
+
     def get(self, id: int) -> Producto | None:
         prod = self.db.query(ProductoModel).filter(ProductoModel.id == id).first()
         return prod and Producto.model_validate(prod)
@@ -51,8 +176,12 @@ class ProductoService:
                 image_url       = payload.image_url,
             )
             self.db.add(prod)
+            self.db.flush()
+            registrar_cambios(self.db, [prod.id])
             self.db.commit()
             self.db.refresh(prod)
+            search_index.upsert(prod.id, prod.nombre, prod.codigo)
+            stock_alerts.observe([(prod.id, None, None, prod.stock_actual, prod.stock_bajo)])
             return Producto.model_validate(prod)
 
         except HTTPException:
@@ -85,6 +214,7 @@ class ProductoService:
         if "stock_bajo" in data and data["stock_bajo"] < 0:
             raise HTTPException(status.HTTP_400_BAD_REQUEST, "stock_bajo no puede ser negativo")
 
+        stock_antes, umbral_antes = prod.stock_actual, prod.stock_bajo
         for fld in (
             "nombre", "codigo", "descripcion",
             "stock_actual", "stock_bajo",
@@ -94,8 +224,11 @@ class ProductoService:
                 setattr(prod, fld, data[fld])
 
         try:
+            registrar_cambios(self.db, [id])
             self.db.commit()
             self.db.refresh(prod)
+            search_index.upsert(prod.id, prod.nombre, prod.codigo)
+            stock_alerts.observe([(prod.id, stock_antes, umbral_antes, prod.stock_actual, prod.stock_bajo)])
             return Producto.model_validate(prod)
         except SQLAlchemyError:
             self.db.rollback()
@@ -103,78 +236,152 @@ class ProductoService:
 
     def delete(self, id: int) -> None:
         self.db.query(ProductoModel).filter(ProductoModel.id == id).delete()
+        registrar_cambios(self.db, [id])
         self.db.commit()
+        search_index.remove(id)
+        stock_alerts.remove(id)
 
     def set_image(self, id: int, image_url: str) -> Producto:
         prod = self.db.query(ProductoModel).filter(ProductoModel.id == id).first()
         if not prod:
             raise HTTPException(status.HTTP_404_NOT_FOUND, "Producto no encontrado")
         prod.image_url = image_url
+        registrar_cambios(self.db, [id])
         self.db.commit()
         self.db.refresh(prod)
         return Producto.model_validate(prod)
 
-    def bulk_update_prices_from_excel(self, file_bytes: bytes) -> tuple[int, list[str]]:
+    def bulk_update_prices_from_excel(
+        self,
+        file_bytes: bytes,
+        chunk_size: int = 1000,
+        on_progress: Callable[[int, int, list[str]], None] | None = None,
+    ) -> tuple[int, list[str]]:
+        """
+        Importa precios desde un Excel recorriéndolo en modo read_only (streaming).
+        Procesa las filas por bloques: una consulta por bloque para traer los
+        productos y un UPDATE masivo por bloque, con commit al final de cada uno.
+        on_progress(filas_procesadas, actualizados, errores) se llama tras cada commit.
+        """
         try:
-            wb = load_workbook(filename=BytesIO(file_bytes), data_only=True)
+            wb = load_workbook(filename=BytesIO(file_bytes), read_only=True, data_only=True)
             ws = wb.active
         except Exception:
             raise HTTPException(status.HTTP_400_BAD_REQUEST, "No se pudo leer el Excel")
 
-        # 1) Leer la fila de encabezados
-        headers = [cell for cell in next(ws.iter_rows(min_row=1, max_row=1, values_only=True))]
         try:
-            idx_id = headers.index("id")
-            idx_price = headers.index("precio_unitario")
-        except ValueError:
-            raise HTTPException(
-                status.HTTP_400_BAD_REQUEST,
-                "El Excel debe tener encabezados 'id' y 'precio_unitario'"
-            )
+            rows = ws.iter_rows(values_only=True)
 
-        updated = 0
-        errors = []
+            # 1) Leer la fila de encabezados
+            headers = list(next(rows, None) or [])
+            try:
+                idx_id = headers.index("id")
+                idx_price = headers.index("precio_unitario")
+            except ValueError:
+                raise HTTPException(
+                    status.HTTP_400_BAD_REQUEST,
+                    "El Excel debe tener encabezados 'id' y 'precio_unitario'"
+                )
 
-        # 2) Iterar a partir de la fila 2
-        for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-            prod_id = row[idx_id]
-            raw_precio = row[idx_price]
+            updated = 0
+            processed = 0
+            # (fila, mensaje): los errores de precio llegan por bloque, después
+            # de los de formato de filas posteriores; se informan ordenados por fila
+            errores: list[tuple[int, str]] = []
+            chunk: list[tuple[int, int, float]] = []
 
-            if prod_id is None or raw_precio is None:
-                errors.append(f"Fila {row_idx}: faltan datos en id o precio")
-                continue
+            # 2) Iterar a partir de la fila 2, validando formato y juntando bloques
+            for row_idx, row in enumerate(rows, start=2):
+                processed += 1
+                prod_id = row[idx_id] if idx_id < len(row) else None
+                raw_precio = row[idx_price] if idx_price < len(row) else None
 
-            # 3) Convertir precio a float
-            try:
-                nuevo_precio = float(raw_precio)
-            except Exception:
-                errors.append(f"Fila {row_idx}: precio inválido '{raw_precio}'")
-                continue
+                if prod_id is None or raw_precio is None:
+                    errores.append((row_idx, f"Fila {row_idx}: faltan datos en id o precio"))
+                    continue
+
+                # 3) Convertir id y precio
+                try:
+                    prod_id = int(prod_id)
+                except Exception:
+                    errores.append((row_idx, f"Fila {row_idx}: id inválido '{prod_id}'"))
+                    continue
+                try:
+                    nuevo_precio = float(raw_precio)
+                except Exception:
+                    errores.append((row_idx, f"Fila {row_idx}: precio inválido '{raw_precio}'"))
+                    continue
+
+                chunk.append((row_idx, prod_id, nuevo_precio))
+                if len(chunk) >= chunk_size:
+                    updated += self._apply_price_chunk(chunk, errores)
+                    chunk = []
+                    if on_progress:
+                        on_progress(processed, updated, _por_fila(errores))
+
+            if chunk:
+                updated += self._apply_price_chunk(chunk, errores)
+            if on_progress:
+                on_progress(processed, updated, _por_fila(errores))
+        finally:
+            wb.close()
 
-            prod = self.db.query(ProductoModel).filter(ProductoModel.id == int(prod_id)).first()
-            if not prod:
-                errors.append(f"Fila {row_idx}: producto {prod_id} no existe")
+        return updated, _por_fila(errores)
+
+    def _apply_price_chunk(self, chunk: list[tuple[int, int, float]], errores: list[tuple[int, str]]) -> int:
+        # 4) Traer el costo de todos los productos del bloque en una sola consulta
+        ids = {prod_id for _, prod_id, _ in chunk}
+        costos = dict(
+            self.db.query(ProductoModel.id, ProductoModel.precio_costo)
+            .filter(ProductoModel.id.in_(ids))
+            .all()
+        )
+
+        cambios = []
+        for row_idx, prod_id, nuevo_precio in chunk:
+            if prod_id not in costos:
+                errores.append((row_idx, f"Fila {row_idx}: producto {prod_id} no existe"))
                 continue
-            if nuevo_precio < prod.precio_costo:
-                errors.append(f"Fila {row_idx}: precio_unitario menor al precio de costo")
+            costo = costos[prod_id]
+            if nuevo_precio < costo:
+                errores.append((row_idx, f"Fila {row_idx}: precio_unitario menor al precio de costo"))
                 continue
+            cambios.append({
+                "id": prod_id,
+                "precio_unitario": nuevo_precio,
+                "margen": (nuevo_precio - costo) / costo * 100 if costo > 0 else 0.0,
+            })
 
-            # 4) Actualizar
-            prod.precio_unitario = nuevo_precio
-            prod.margen = (
-                (nuevo_precio - prod.precio_costo) / prod.precio_costo * 100
-                if prod.precio_costo > 0 else 0.0
-            )
-            self.db.add(prod)
-            updated += 1
-
-        # 5) Commit
+        # 5) UPDATE masivo por clave primaria y commit del bloque. En orden de id,
+        # como las ventas, para no bloquear filas en orden cruzado (orden estable:
+        # si un id se repite en la planilla gana la última fila)
+        cambios.sort(key=lambda c: c["id"])
         try:
+            if cambios:
+                self.db.execute(update(ProductoModel), cambios)
+                registrar_cambios(self.db, [c["id"] for c in cambios])
             self.db.commit()
         except SQLAlchemyError:
             self.db.rollback()
             raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR,
                                 "Error interno al importar precios")
+        return len(cambios)
+
+
+def _por_fila(errores: list[tuple[int, str]]) -> list[str]:
+    return [msg for _, msg in sorted(errores, key=lambda e: e[0])]
 
-        return updated, errors
 
+class AsyncProductoService:
+    """Lecturas de productos con AsyncSession; las escrituras siguen en ProductoService."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_all(self) -> list[Producto]:
+        prods = (await self.db.scalars(select(ProductoModel))).all()
+        return [Producto.model_validate(p) for p in prods]
+
+    async def get(self, id: int) -> Producto | None:
+        prod = await self.db.get(ProductoModel, id)
+        return prod and Producto.model_validate(prod)
@@ -0,0 +1,324 @@
+# services/reportes.py
+
+import sys
+from datetime import date, datetime, time, timedelta
+from typing import Iterable
+
+from sqlalchemy import bindparam, func, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.reportes import ReporteDiarioProducto, ReporteDiarioFormaPago, ReporteDiarioUsuario
+from models.ventas import Venta as VentaModel
+from models.detalle_venta import DetalleVenta as DetalleVentaModel
+from models.devoluciones import Devolucion, DetalleDevolucion
+from schemas.reporte import ReporteDiario, ReporteProducto, ReporteFormaPago, ReporteUsuario
+
+# Un aporte es (tabla, clave, {columna: delta})
+Aporte = tuple[type, dict, dict]
+
+
+def _dia(valor) -> date:
+    # func.date() devuelve str en SQLite y date en MySQL
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, str):
+        return date.fromisoformat(valor[:10])
+    return valor
+
+
+def aportes_venta(venta: VentaModel, lineas: Iterable[DetalleVentaModel] | None, signo: int = 1) -> list[Aporte]:
+    """
+    Lo que una venta suma a los resúmenes diarios. Con lineas=None se omite
+    el resumen por producto (cambios que solo tocan la cabecera).
+    """
+    dia = _dia(venta.fecha)
+    pct = (venta.descuento or 0.0) / 100
+    aportes: list[Aporte] = [
+        (ReporteDiarioFormaPago,
+         {"fecha": dia, "forma_pago": venta.forma_pago, "pagado": bool(venta.pagado)},
+         {"ventas": signo, "bruto": signo * venta.total_sin_descuento, "neto": signo * venta.total}),
+    ]
+    costo_total = 0.0
+    for linea in lineas or []:
+        costo = (linea.costo_unitario or 0) * linea.cantidad
+        costo_total += costo
+        aportes.append((
+            ReporteDiarioProducto,
+            {"fecha": dia, "producto_id": linea.producto_id},
+            {
+                "cantidad": signo * linea.cantidad,
+                "bruto": signo * linea.precio_unitario * linea.cantidad,
+                "neto": signo * linea.subtotal * (1 - pct),
+                "costo": signo * costo,
+            },
+        ))
+    aportes.append((
+        ReporteDiarioUsuario,
+        {"fecha": dia, "usuario_id": venta.usuario_id},
+        {"ventas": signo, "neto": signo * venta.total, "costo": signo * costo_total},
+    ))
+    return aportes
+
+
+def aportes_devolucion(fecha, detalles: Iterable[tuple[int, float, float]], signo: int = 1) -> list[Aporte]:
+    """detalles: (producto_id, cantidad, subtotal) de cada línea devuelta."""
+    dia = _dia(fecha)
+    return [
+        (ReporteDiarioProducto,
+         {"fecha": dia, "producto_id": producto_id},
+         {"cantidad_devuelta": signo * cantidad, "monto_devuelto": signo * subtotal})
+        for producto_id, cantidad, subtotal in detalles
+    ]
+
+
+def acumular(db: Session, aportes: Iterable[Aporte]) -> None:
+    """
+    Aplica los aportes con UPDATE col = col + delta (atómico bajo el lock de fila),
+    insertando las filas que todavía no existen. No hace commit.
+    Una consulta de existencia, un UPDATE y a lo sumo un INSERT (executemany)
+    por tabla y juego de columnas, sin importar cuántas filas toque.
+    Llamar después de bloquear/ajustar productos: el orden de locks es
+    siempre productos y luego filas de reporte.
+    """
+    merged: dict[tuple, dict] = {}
+    for model, clave, valores in aportes:
+        acc = merged.setdefault((model, tuple(sorted(clave.items()))), {})
+        for col, delta in valores.items():
+            acc[col] = acc.get(col, 0) + delta
+
+    # Filas agrupadas por (tabla, columnas de clave, columnas a sumar)
+    grupos: dict[tuple, list[tuple[tuple, dict]]] = {}
+    for (model, clave_items), valores in merged.items():
+        valores = {col: delta for col, delta in valores.items() if delta}
+        if valores:
+            cols = (model, tuple(c for c, _ in clave_items), tuple(sorted(valores)))
+            grupos.setdefault(cols, []).append((tuple(v for _, v in clave_items), valores))
+
+    # Orden fijo (tabla y clave) para que transacciones concurrentes bloqueen filas en el mismo orden
+    for (model, claves, columnas), filas in sorted(grupos.items(), key=lambda kv: (kv[0][0].__tablename__, kv[0][1:])):
+        filas.sort(key=lambda fila: fila[0])
+        _acumular_grupo(db, model, claves, columnas, filas)
+
+
+def _acumular_grupo(db: Session, model, claves: tuple, columnas: tuple, filas: list[tuple[tuple, dict]]) -> None:
+    tabla = model.__table__
+    key_cols = [tabla.c[col] for col in claves]
+    existentes = set(db.execute(
+        select(*key_cols).where(tuple_(*key_cols).in_([clave for clave, _ in filas]))
+    ).all())
+
+    # bindparams con prefijo: los nombres de columna están reservados para el SET
+    stmt = (
+        update(tabla)
+        .where(*[tabla.c[col] == bindparam(f"k_{col}") for col in claves])
+        .values({col: tabla.c[col] + bindparam(f"d_{col}") for col in columnas})
+    )
+
+    def params(clave: tuple, valores: dict) -> dict:
+        return {**{f"k_{c}": v for c, v in zip(claves, clave)}, **{f"d_{c}": valores[c] for c in columnas}}
+
+    actualizar = [params(clave, valores) for clave, valores in filas if clave in existentes]
+    if actualizar:
+        db.execute(stmt, actualizar)
+    nuevas = [(clave, valores) for clave, valores in filas if clave not in existentes]
+    if not nuevas:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(tabla), [{**dict(zip(claves, clave)), **valores} for clave, valores in nuevas])
+    except IntegrityError:
+        # otra transacción creó alguna de las filas en paralelo: se suman una por una
+        for clave, valores in nuevas:
+            if db.execute(stmt, params(clave, valores)).rowcount:
+                continue
+            db.execute(insert(tabla).values(**dict(zip(claves, clave)), **valores))
+
+
+def _rango(q, columna, desde: date | None, hasta: date | None):
+    if desde is not None:
+        q = q.filter(columna >= desde)
+    if hasta is not None:
+        q = q.filter(columna <= hasta)
+    return q
+
+
+def reconstruir(db: Session, desde: date | None = None, hasta: date | None = None) -> int:
+    """
+    Recalcula los resúmenes del rango a partir de ventas y devoluciones
+    (backfill o corrección). Devuelve la cantidad de filas generadas.
+    """
+    for model in (ReporteDiarioProducto, ReporteDiarioFormaPago, ReporteDiarioUsuario):
+        _rango(db.query(model), model.fecha, desde, hasta).delete(synchronize_session=False)
+
+    def rango_fecha(q, columna):
+        if desde is not None:
+            q = q.filter(columna >= datetime.combine(desde, time.min))
+        if hasta is not None:
+            q = q.filter(columna < datetime.combine(hasta + timedelta(days=1), time.min))
+        return q
+
+    dia_venta = func.date(VentaModel.fecha)
+    filas: dict[tuple, dict] = {}
+
+    def sumar(model, clave: dict, valores: dict):
+        acc = filas.setdefault((model, tuple(clave.items())), {})
+        for col, v in valores.items():
+            acc[col] = acc.get(col, 0) + (v or 0)
+
+    q = rango_fecha(
+        db.query(
+            dia_venta, DetalleVentaModel.producto_id,
+            func.sum(DetalleVentaModel.cantidad),
+            func.sum(DetalleVentaModel.precio_unitario * DetalleVentaModel.cantidad),
+            func.sum(DetalleVentaModel.subtotal * (1 - func.coalesce(VentaModel.descuento, 0) / 100)),
+            func.sum(func.coalesce(DetalleVentaModel.costo_unitario, 0) * DetalleVentaModel.cantidad),
+        ).join(VentaModel, VentaModel.id == DetalleVentaModel.venta_id),
+        VentaModel.fecha,
+    ).group_by(dia_venta, DetalleVentaModel.producto_id)
+    for dia, pid, cantidad, bruto, neto, costo in q:
+        sumar(ReporteDiarioProducto, {"fecha": _dia(dia), "producto_id": pid},
+              {"cantidad": cantidad, "bruto": bruto, "neto": neto, "costo": costo})
+
+    dia_dev = func.date(Devolucion.fecha)
+    q = rango_fecha(
+        db.query(
+            dia_dev, DetalleDevolucion.producto_id,
+            func.sum(DetalleDevolucion.cantidad), func.sum(DetalleDevolucion.subtotal),
+        ).join(Devolucion, Devolucion.id == DetalleDevolucion.devolucion_id),
+        Devolucion.fecha,
+    ).group_by(dia_dev, DetalleDevolucion.producto_id)
+    for dia, pid, cantidad, monto in q:
+        sumar(ReporteDiarioProducto, {"fecha": _dia(dia), "producto_id": pid},
+              {"cantidad_devuelta": cantidad, "monto_devuelto": monto})
+
+    q = rango_fecha(
+        db.query(
+            dia_venta, VentaModel.forma_pago, VentaModel.pagado,
+            func.count(VentaModel.id), func.sum(VentaModel.total_sin_descuento), func.sum(VentaModel.total),
+        ),
+        VentaModel.fecha,
+    ).group_by(dia_venta, VentaModel.forma_pago, VentaModel.pagado)
+    for dia, forma_pago, pagado, ventas, bruto, neto in q:
+        sumar(ReporteDiarioFormaPago, {"fecha": _dia(dia), "forma_pago": forma_pago, "pagado": bool(pagado)},
+              {"ventas": ventas, "bruto": bruto, "neto": neto})
+
+    q = rango_fecha(
+        db.query(dia_venta, VentaModel.usuario_id, func.count(VentaModel.id), func.sum(VentaModel.total)),
+        VentaModel.fecha,
+    ).group_by(dia_venta, VentaModel.usuario_id)
+    for dia, usuario_id, ventas, neto in q:
+        sumar(ReporteDiarioUsuario, {"fecha": _dia(dia), "usuario_id": usuario_id},
+              {"ventas": ventas, "neto": neto})
+
+    q = rango_fecha(
+        db.query(
+            dia_venta, VentaModel.usuario_id,
+            func.sum(func.coalesce(DetalleVentaModel.costo_unitario, 0) * DetalleVentaModel.cantidad),
+        ).join(VentaModel, VentaModel.id == DetalleVentaModel.venta_id),
+        VentaModel.fecha,
+    ).group_by(dia_venta, VentaModel.usuario_id)
+    for dia, usuario_id, costo in q:
+        sumar(ReporteDiarioUsuario, {"fecha": _dia(dia), "usuario_id": usuario_id}, {"costo": costo})
+
+    por_tabla: dict[type, list[dict]] = {}
+    for (model, clave_items), valores in filas.items():
+        por_tabla.setdefault(model, []).append({**dict(clave_items), **valores})
+    for model, rows in por_tabla.items():
+        db.execute(insert(model), rows)
+    db.commit()
+    return len(filas)
+
+
+class ReporteService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def diario(self, desde: date | None = None, hasta: date | None = None) -> list[ReporteDiario]:
+        P, F = ReporteDiarioProducto, ReporteDiarioFormaPago
+        productos = _rango(
+            self.db.query(P.fecha, func.sum(P.neto), func.sum(P.costo), func.sum(P.monto_devuelto)),
+            P.fecha, desde, hasta,
+        ).group_by(P.fecha)
+        ventas = _rango(
+            self.db.query(F.fecha, func.sum(F.ventas), func.sum(F.bruto), func.sum(F.neto)),
+            F.fecha, desde, hasta,
+        ).group_by(F.fecha)
+
+        dias: dict[date, dict] = {}
+        for dia, cantidad, bruto, neto in ventas:
+            dias[_dia(dia)] = {"ventas": cantidad or 0, "bruto": bruto or 0.0, "neto": neto or 0.0}
+        for dia, _, costo, devuelto in productos:
+            d = dias.setdefault(_dia(dia), {"ventas": 0, "bruto": 0.0, "neto": 0.0})
+            d["costo"] = costo or 0.0
+            d["monto_devuelto"] = devuelto or 0.0
+
+        return [
+            ReporteDiario(
+                fecha=dia,
+                ventas=d["ventas"],
+                bruto=d["bruto"],
+                neto=d["neto"],
+                costo=d.get("costo", 0.0),
+                ganancia=d["neto"] - d.get("costo", 0.0),
+                monto_devuelto=d.get("monto_devuelto", 0.0),
+            )
+            for dia, d in sorted(dias.items())
+        ]
+
+    def por_producto(self, desde: date | None = None, hasta: date | None = None) -> list[ReporteProducto]:
+        P = ReporteDiarioProducto
+        q = _rango(
+            self.db.query(
+                P.producto_id, func.sum(P.cantidad), func.sum(P.bruto), func.sum(P.neto),
+                func.sum(P.costo), func.sum(P.cantidad_devuelta), func.sum(P.monto_devuelto),
+            ),
+            P.fecha, desde, hasta,
+        ).group_by(P.producto_id).having(
+            (func.sum(P.cantidad) != 0) | (func.sum(P.cantidad_devuelta) != 0)
+        ).order_by(func.sum(P.neto).desc())
+        return [
+            ReporteProducto(
+                producto_id=pid, cantidad=cantidad or 0, bruto=bruto or 0, neto=neto or 0,
+                costo=costo or 0, ganancia=(neto or 0) - (costo or 0),
+                cantidad_devuelta=cant_dev or 0, monto_devuelto=monto_dev or 0,
+            )
+            for pid, cantidad, bruto, neto, costo, cant_dev, monto_dev in q
+        ]
+
+    def por_forma_pago(self, desde: date | None = None, hasta: date | None = None) -> list[ReporteFormaPago]:
+        F = ReporteDiarioFormaPago
+        q = _rango(
+            self.db.query(F.forma_pago, F.pagado, func.sum(F.ventas), func.sum(F.bruto), func.sum(F.neto)),
+            F.fecha, desde, hasta,
+        ).group_by(F.forma_pago, F.pagado).having(func.sum(F.ventas) != 0).order_by(F.forma_pago, F.pagado)
+        return [
+            ReporteFormaPago(forma_pago=fp, pagado=bool(pagado), ventas=ventas or 0, bruto=bruto or 0, neto=neto or 0)
+            for fp, pagado, ventas, bruto, neto in q
+        ]
+
+    def por_usuario(self, desde: date | None = None, hasta: date | None = None) -> list[ReporteUsuario]:
+        U = ReporteDiarioUsuario
+        q = _rango(
+            self.db.query(U.usuario_id, func.sum(U.ventas), func.sum(U.neto), func.sum(U.costo)),
+            U.fecha, desde, hasta,
+        ).group_by(U.usuario_id).having(func.sum(U.ventas) != 0).order_by(U.usuario_id)
+        return [
+            ReporteUsuario(usuario_id=uid, ventas=ventas or 0, neto=neto or 0, costo=costo or 0,
+                           ganancia=(neto or 0) - (costo or 0))
+            for uid, ventas, neto, costo in q
+        ]
+
+
+if __name__ == "__main__":
+    # Backfill: python -m services.reportes [desde] [hasta]   (fechas YYYY-MM-DD)
+    from config.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    args = [date.fromisoformat(a) for a in sys.argv[1:3]]
+    db = SessionLocal()
+    try:
+        n = reconstruir(db, *args)
+        print(f"Resúmenes reconstruidos: {n} filas")
+    finally:
+        db.close()
@@ -1,3 +1,6 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from models.usuarios import Usuarios as UsuariosModel
 from schemas.usuarios import Usuarios
 
@@ -14,6 +17,9 @@ class UsuariosService:
     def get_usuario(self, id: int) -> UsuariosModel | None:
         return self.db.query(UsuariosModel).filter(UsuariosModel.id == id).first()
 
+    def get_by_username(self, username: str) -> UsuariosModel | None:
+        return self.db.query(UsuariosModel).filter(UsuariosModel.username == username).first()
+
     def create_usuarios(self, usuario: Usuarios) -> UsuariosModel:
         # Ahora incluimos el campo role al crear
         new_usuario = UsuariosModel(
@@ -43,3 +49,14 @@ class UsuariosService:
     def delete_usuarios(self, id: int) -> None:
         self.db.query(UsuariosModel).filter(UsuariosModel.id == id).delete()
         self.db.commit()
+
+
+class AsyncUsuariosService:
+    """Consultas de usuarios con AsyncSession (validación de token en JWTBearer)."""
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def get_by_username(self, username: str) -> UsuariosModel | None:
+        result = await self.db.execute(select(UsuariosModel).where(UsuariosModel.username == username))
+        return result.scalars().first()
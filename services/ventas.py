@@ -1,11 +1,94 @@
 # src/services/ventas.py
 
+from datetime import datetime
+
 from fastapi import HTTPException
+from sqlalchemy import and_, case, or_, select, update
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from models.ventas import Venta as VentaModel
 from models.detalle_venta import DetalleVenta as DetalleVentaModel
 from models.productos import Producto as ProductoModel
-from schemas.venta import VentaCreate, Venta
+from models.devoluciones import Devolucion as DevolucionModel
+from schemas.venta import VentaCreate, Venta, VentaCompleta, DetalleVentaCompleta
+from services.productos import registrar_cambios
+from services.reportes import acumular, aportes_venta
+from utils.cursor import decode_cursor, encode_cursor, fecha_keyset
+from utils.metrics import metrics
+from utils.stock_alerts import CambioStock, stock_alerts
+
+# Carga de líneas (con producto) y devoluciones (con detalles) para la venta completa
+_CARGA_COMPLETA = (
+    selectinload(VentaModel.detalles).joinedload(DetalleVentaModel.producto),
+    selectinload(VentaModel.devoluciones).selectinload(DevolucionModel.detalles),
+)
+
+def _filtrar(q, cursor, desde, hasta, cliente_id, usuario_id, forma_pago, pagado):
+    """
+    Filtros y orden (fecha desc, id desc) del listado de ventas.
+    Sirve tanto para Query (sesión sync) como para select() (sesión async).
+    """
+    if desde is not None:
+        q = q.where(VentaModel.fecha >= desde)
+    if hasta is not None:
+        q = q.where(VentaModel.fecha <= hasta)
+    if cliente_id is not None:
+        q = q.where(VentaModel.cliente_id == cliente_id)
+    if usuario_id is not None:
+        q = q.where(VentaModel.usuario_id == usuario_id)
+    if forma_pago is not None:
+        q = q.where(VentaModel.forma_pago == forma_pago)
+    if pagado is not None:
+        q = q.where(VentaModel.pagado == pagado)
+    fecha = fecha_keyset(VentaModel.fecha)
+    if cursor:
+        c_fecha, c_id = decode_cursor(cursor)
+        q = q.where(or_(
+            fecha < fecha_keyset(c_fecha),
+            and_(fecha == fecha_keyset(c_fecha), VentaModel.id < c_id),
+        ))
+    return q.order_by(fecha.desc(), VentaModel.id.desc())
+
+def _pagina(ventas: list, limit: int | None) -> tuple[list[Venta], str | None]:
+    # Se pide una fila extra para saber si hay página siguiente
+    next_cursor = None
+    if limit is not None and len(ventas) > limit:
+        ventas = ventas[:limit]
+        last = ventas[-1]
+        next_cursor = encode_cursor(last.fecha, last.id)
+    return [Venta.model_validate(v) for v in ventas], next_cursor
+
+def _venta_completa(v: VentaModel) -> VentaCompleta:
+    devuelto: dict[int, float] = {}
+    for devol in v.devoluciones:
+        for d in devol.detalles:
+            devuelto[d.producto_id] = devuelto.get(d.producto_id, 0) + d.cantidad
+
+    # Las devoluciones son por producto: se imputan a sus líneas en orden
+    detalles = []
+    for linea in v.detalles:
+        imputado = min(linea.cantidad, devuelto.get(linea.producto_id, 0))
+        devuelto[linea.producto_id] = devuelto.get(linea.producto_id, 0) - imputado
+        detalles.append(DetalleVentaCompleta(
+            id                   = linea.id,
+            producto_id          = linea.producto_id,
+            producto_nombre      = linea.producto.nombre if linea.producto else None,
+            cantidad             = linea.cantidad,
+            precio_unitario      = linea.precio_unitario,
+            descuento_individual = linea.descuento_individual,
+            subtotal             = linea.subtotal,
+            costo_unitario       = linea.costo_unitario,
+            cantidad_devuelta    = imputado,
+            cantidad_devolvible  = linea.cantidad - imputado,
+        ))
+
+    return VentaCompleta(
+        **Venta.model_validate(v).model_dump(),
+        detalles=detalles,
+        devoluciones=v.devoluciones,
+    )
 
 class VentaService:
     def __init__(self, db):
@@ -15,6 +98,44 @@ class VentaService:
         ventas = self.db.query(VentaModel).order_by(VentaModel.fecha.desc(), VentaModel.id.desc()).all()
         return [Venta.model_validate(v) for v in ventas]
 
+    def get_page(
+        self,
+        limit: int | None = None,
+        cursor: str | None = None,
+        desde: datetime | None = None,
+        hasta: datetime | None = None,
+        cliente_id: int | None = None,
+        usuario_id: int | None = None,
+        forma_pago: str | None = None,
+        pagado: bool | None = None,
+    ) -> tuple[list[Venta], str | None]:
+        """
+        Listado filtrado con paginación keyset sobre (fecha desc, id desc).
+        Devuelve la página y el cursor de la siguiente (None si no hay más).
+        """
+        q = self.query(
+            cursor=cursor, desde=desde, hasta=hasta, cliente_id=cliente_id,
+            usuario_id=usuario_id, forma_pago=forma_pago, pagado=pagado,
+        )
+        if limit is not None:
+            q = q.limit(limit + 1)
+        return _pagina(q.all(), limit)
+
+    def query(
+        self,
+        cursor: str | None = None,
+        desde: datetime | None = None,
+        hasta: datetime | None = None,
+        cliente_id: int | None = None,
+        usuario_id: int | None = None,
+        forma_pago: str | None = None,
+        pagado: bool | None = None,
+    ):
+        """Consulta filtrada y ordenada por (fecha desc, id desc), sin ejecutar."""
+        return _filtrar(
+            self.db.query(VentaModel), cursor, desde, hasta, cliente_id, usuario_id, forma_pago, pagado
+        )
+
     def get(self, id: int) -> Venta | None:
         v = (
             self.db.query(VentaModel)
@@ -25,7 +146,31 @@ class VentaService:
             return None
         return Venta.model_validate(v)
 
+    def get_completa(self, id: int) -> VentaCompleta | None:
+        """
+        Venta con sus líneas (y nombre de producto) y sus devoluciones, en un
+        número fijo de consultas: venta, líneas+productos, devoluciones y sus detalles.
+        """
+        v = (
+            self.db.query(VentaModel)
+            .options(*_CARGA_COMPLETA)
+            .filter(VentaModel.id == id)
+            .first()
+        )
+        if not v:
+            return None
+
+        return _venta_completa(v)
+
     def create(self, payload: VentaCreate) -> Venta:
+        venta, _ = self.create_with_stock(payload)
+        return venta
+
+    def create_with_stock(self, payload: VentaCreate) -> tuple[Venta, dict[int, int]]:
+        """
+        Igual que create, pero además devuelve el stock resultante
+        {producto_id: stock_actual} de cada producto vendido.
+        """
         try:
             # 1) Calcular bruto (sin descuentos)
             gross_total = sum(d.precio_unitario * d.cantidad for d in payload.detalles)
@@ -68,19 +213,32 @@ class VentaService:
             self.db.add(venta)
             self.db.flush()  # para obtener venta.id
 
-            # 6) Procesar cada detalle: stock y registro
+            # 6) Cantidades pedidas por producto (un producto puede repetirse en el carrito)
+            pedidos: dict[int, float] = {}
             for d in payload.detalles:
-                prod = (
+                pedidos[d.producto_id] = pedidos.get(d.producto_id, 0) + d.cantidad
+            ids = sorted(pedidos)
+
+            # 6.1) Traer y bloquear todos los productos en una sola consulta.
+            # El orden fijo por id evita deadlocks entre ventas concurrentes.
+            prods = {
+                p.id: p
+                for p in (
                     self.db.query(ProductoModel)
-                    .filter(ProductoModel.id == d.producto_id)
-                    .first()
+                    .filter(ProductoModel.id.in_(ids))
+                    .order_by(ProductoModel.id)
+                    .with_for_update()
+                    .all()
                 )
+            }
+            for pid in ids:
+                prod = prods.get(pid)
                 if not prod:
                     raise HTTPException(
                         status_code=404,
-                        detail=f"Producto {d.producto_id} no existe"
+                        detail=f"Producto {pid} no existe"
                     )
-                if prod.stock_actual < d.cantidad:
+                if prod.stock_actual < pedidos[pid]:
                     raise HTTPException(
                         status_code=400,
                         detail=(
@@ -88,10 +246,37 @@ class VentaService:
                             f"disponible {prod.stock_actual}"
                         )
                     )
-                # descontar stock
-                prod.stock_actual -= d.cantidad
-                self.db.add(prod)
 
+            # 6.2) Descontar stock con un único UPDATE condicional
+            cantidad = case(pedidos, value=ProductoModel.id)
+            res = self.db.execute(
+                update(ProductoModel)
+                .where(
+                    ProductoModel.id.in_(ids),
+                    ProductoModel.stock_actual >= cantidad,
+                )
+                .values(stock_actual=ProductoModel.stock_actual - cantidad)
+                .execution_options(synchronize_session=False)
+            )
+            if res.rowcount != len(ids):
+                raise HTTPException(
+                    status_code=409,
+                    detail="El stock cambió durante la venta, intente nuevamente"
+                )
+            # reflejar el nuevo stock en memoria sin generar otro UPDATE
+            nuevo_stock: dict[int, int] = {}
+            cambios: list[CambioStock] = []
+            for pid in ids:
+                prod = prods[pid]
+                # stock_actual es entero en la tabla; MySQL redondea al asignar
+                nuevo_stock[pid] = int(round(prod.stock_actual - pedidos[pid]))
+                cambios.append((pid, prod.stock_actual, prod.stock_bajo, nuevo_stock[pid], prod.stock_bajo))
+                set_committed_value(prod, "stock_actual", nuevo_stock[pid])
+            registrar_cambios(self.db, ids)
+
+            # 6.3) Registrar los detalles
+            lineas: list[DetalleVentaModel] = []
+            for d in payload.detalles:
                 # recalcular subtotal de la línea con descuento individual
                 line_subtotal = (
                     d.precio_unitario
@@ -106,14 +291,21 @@ class VentaService:
                     precio_unitario      = d.precio_unitario,
                     descuento_individual = d.descuento_individual,
                     subtotal             = line_subtotal,
-                    costo_unitario       = prod.precio_costo # Guardamos el costo histórico
+                    costo_unitario       = prods[d.producto_id].precio_costo # Guardamos el costo histórico
                 )
                 self.db.add(detalle)
+                lineas.append(detalle)
+
+            # 6.4) Sumar la venta a los resúmenes diarios
+            acumular(self.db, aportes_venta(venta, lineas))
 
             # 7) Commit y refrescar
             self.db.commit()
+            stock_alerts.observe(cambios)
+            metrics.inc("ventas_creadas_total", (venta.forma_pago,))
+            metrics.inc("ventas_monto_total", (venta.forma_pago,), venta.total)
             self.db.refresh(venta)
-            return Venta.model_validate(venta)
+            return Venta.model_validate(venta), nuevo_stock
 
         except HTTPException:
             self.db.rollback()
@@ -134,6 +326,10 @@ class VentaService:
         if not venta:
             return None
 
+        # Aporte actual a los reportes, para reemplazarlo por el nuevo
+        lineas = self.db.query(DetalleVentaModel).filter(DetalleVentaModel.venta_id == id).all()
+        anteriores = aportes_venta(venta, lineas, -1)
+
         # Actualiza cabecera: totales, forma_pago y pagado
         total_bruto = sum(d.subtotal for d in payload.detalles)
         pct = payload.descuento or 0.0
@@ -147,11 +343,16 @@ class VentaService:
         venta.forma_pago          = payload.forma_pago
         venta.pagado              = payload.pagado
 
+        acumular(self.db, anteriores + aportes_venta(venta, lineas))
         self.db.commit()
         self.db.refresh(venta)
         return Venta.model_validate(venta)
 
     def delete(self, id: int) -> None:
+        venta = self.db.query(VentaModel).filter(VentaModel.id == id).first()
+        if venta:
+            lineas = self.db.query(DetalleVentaModel).filter(DetalleVentaModel.venta_id == id).all()
+            acumular(self.db, aportes_venta(venta, lineas, -1))
         self.db.query(VentaModel).filter(VentaModel.id == id).delete()
         self.db.commit()
 
@@ -163,7 +364,42 @@ class VentaService:
         )
         if not venta:
             raise HTTPException(status_code=404, detail="Venta no encontrada")
+        anteriores = aportes_venta(venta, None, -1)
         venta.pagado = pagado
+        acumular(self.db, anteriores + aportes_venta(venta, None))
         self.db.commit()
         self.db.refresh(venta)
         return Venta.model_validate(venta)
+
+
+class AsyncVentaService:
+    """Lecturas de ventas con AsyncSession; las escrituras siguen en VentaService."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_page(
+        self,
+        limit: int | None = None,
+        cursor: str | None = None,
+        desde: datetime | None = None,
+        hasta: datetime | None = None,
+        cliente_id: int | None = None,
+        usuario_id: int | None = None,
+        forma_pago: str | None = None,
+        pagado: bool | None = None,
+    ) -> tuple[list[Venta], str | None]:
+        stmt = _filtrar(select(VentaModel), cursor, desde, hasta, cliente_id, usuario_id, forma_pago, pagado)
+        if limit is not None:
+            stmt = stmt.limit(limit + 1)
+        ventas = (await self.db.scalars(stmt)).all()
+        return _pagina(list(ventas), limit)
+
+    async def get(self, id: int) -> Venta | None:
+        v = await self.db.get(VentaModel, id)
+        return Venta.model_validate(v) if v else None
+
+    async def get_completa(self, id: int) -> VentaCompleta | None:
+        stmt = select(VentaModel).options(*_CARGA_COMPLETA).where(VentaModel.id == id)
+        v = (await self.db.scalars(stmt)).first()
+        return _venta_completa(v) if v else None
@@ -92,7 +92,12 @@ wsStock.addEventListener("open", () => console.log("🔌 Conectado a ws/stock"))
 wsStock.addEventListener("message", evt => {
   const msg = JSON.parse(evt.data);
   if (msg.event === "stock_update") {
-    updateStock(msg);
+    // Las ventas envían un solo evento con todos los productos afectados
+    if (Array.isArray(msg.productos)) {
+      msg.productos.forEach(updateStock);
+    } else {
+      updateStock(msg);
+    }
   }
 });
 wsStock.addEventListener("error", e => console.error("WS Stock error:", e));
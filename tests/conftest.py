@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Base SQLite descartable para los tests que levantan la app; tiene que
+# definirse antes de importar config.settings
+_tmp = tempfile.mkdtemp(prefix="tienda-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/tienda.sqlite")
@@ -0,0 +1,111 @@
+import asyncio
+import fnmatch
+import time
+
+from utils.broadcast_backend import RedisBackend, _encode_command, _read_reply
+
+class FakeRedis:
+    """Servidor RESP mínimo (PSUBSCRIBE / PUBLISH) para probar RedisBackend sin Redis."""
+
+    def __init__(self, mute: bool = False):
+        self.mute = mute   # acepta conexiones pero nunca responde
+        self.subs: list[tuple[str, asyncio.StreamWriter]] = []
+        self.server: asyncio.Server | None = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self.server.close()
+        for _, writer in self.subs:
+            writer.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                cmd = await _read_reply(reader)
+                if self.mute:
+                    continue
+                if cmd[0] == "PSUBSCRIBE":
+                    self.subs.append((cmd[1], writer))
+                    writer.write(b"*3\r\n" + _encode_command("psubscribe", cmd[1])[4:] + b":1\r\n")
+                elif cmd[0] == "PUBLISH":
+                    n = 0
+                    for patron, sub in self.subs:
+                        if fnmatch.fnmatch(cmd[1], patron):
+                            sub.write(_encode_command("pmessage", patron, cmd[1], cmd[2]))
+                            n += 1
+                    writer.write(f":{n}\r\n".encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+
+def _backend(port: int, **kwargs) -> tuple[RedisBackend, list]:
+    recibidos: list[tuple[str, str]] = []
+
+    async def deliver(channel: str, text: str) -> None:
+        recibidos.append((channel, text))
+
+    backend = RedisBackend(f"redis://127.0.0.1:{port}", **kwargs)
+    backend.attach(deliver)
+    return backend, recibidos
+
+async def _esperar_conexion(*backends: RedisBackend) -> None:
+    for _ in range(100):
+        if all(b.connected for b in backends):
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("El backend no se suscribió")
+
+def test_publish_llega_a_todos_los_procesos_una_vez():
+    async def main():
+        redis = FakeRedis()
+        port = await redis.start()
+        a, recibidos_a = _backend(port)
+        b, recibidos_b = _backend(port)
+        await a.start()
+        await b.start()
+        await _esperar_conexion(a, b)
+
+        await a.publish("stock", "hola")
+        await asyncio.sleep(0.1)
+
+        await a.stop()
+        await b.stop()
+        await redis.stop()
+        assert recibidos_a == [("stock", "hola")]
+        assert recibidos_b == [("stock", "hola")]
+
+    asyncio.run(main())
+
+def test_sin_suscripcion_entrega_local():
+    async def main():
+        redis = FakeRedis()
+        port = await redis.start()
+        backend, recibidos = _backend(port)   # sin start(): la suscripción no está activa
+
+        await backend.publish("ventas", "x")
+
+        await backend.stop()
+        await redis.stop()
+        assert recibidos == [("ventas", "x")]
+
+    asyncio.run(main())
+
+def test_redis_que_no_responde_no_cuelga_el_broadcast():
+    async def main():
+        redis = FakeRedis(mute=True)
+        port = await redis.start()
+        backend, recibidos = _backend(port, timeout=0.2)
+
+        inicio = time.perf_counter()
+        await backend.publish("stock", "y")
+        demora = time.perf_counter() - inicio
+
+        await backend.stop()
+        await redis.stop()
+        assert demora < 1
+        assert recibidos == [("stock", "y")]
+
+    asyncio.run(main())
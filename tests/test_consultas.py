@@ -0,0 +1,87 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from utils.request_timing import capture_queries
+
+# Consultas por request, fijas sin importar cuántas líneas tenga la venta o la devolución
+CREAR_DEVOLUCION = 14    # venta, límites, cabecera, líneas, productos, stock, versión, cambios, reportes, refresh
+EDITAR_DEVOLUCION = 15
+COMPLETA = 4             # venta, líneas+productos, devoluciones y sus detalles
+
+@pytest.fixture(scope="module")
+def client():
+    import main
+    return TestClient(main.app)
+
+@pytest.fixture(scope="module")
+def auth(client) -> dict:
+    client.post("/usuarios", json={"id": 0, "username": "admin", "password": "secret", "role": "admin"})
+    token = client.post("/login", json={"username": "admin", "password": "secret"}).json()["token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def _producto(client, auth, codigo: str) -> int:
+    r = client.post("/productos", headers=auth, data={
+        "nombre": f"Producto {codigo}", "codigo": codigo, "stock_actual": 500,
+        "precio_costo": 60, "precio_unitario": 100,
+    })
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+def _venta(client, auth, productos: list[int], cantidad: int = 3) -> int:
+    r = client.post("/ventas", headers=auth, json={
+        "cliente_id": None, "usuario_id": 1,
+        "detalles": [
+            {"producto_id": p, "cantidad": cantidad, "precio_unitario": 100,
+             "subtotal": 100 * cantidad, "descuento_individual": 0}
+            for p in productos
+        ],
+    })
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+def _items(productos: list[int], cantidad: int = 1) -> list[dict]:
+    return [{"producto_id": p, "cantidad": cantidad} for p in productos]
+
+@pytest.fixture(scope="module")
+def productos(client, auth) -> list[int]:
+    return [_producto(client, auth, f"Q{i}") for i in range(6)]
+
+def test_crear_y_editar_devolucion_no_escala_con_los_items(client, auth, productos):
+    # La misma cantidad de consultas con 1 o con 6 líneas
+    for items in (productos[:1], productos):
+        venta_id = _venta(client, auth, productos)
+        with capture_queries() as log:
+            r = client.post("/devoluciones/", json={"venta_id": venta_id, "items": _items(items)})
+        assert r.status_code == 200, r.text
+        log.assert_max(CREAR_DEVOLUCION)
+        log.assert_no_n_plus_one()
+
+        with capture_queries() as log:
+            r = client.put(f"/devoluciones/{r.json()['id']}", json={"venta_id": venta_id, "items": _items(items, 2)})
+        assert r.status_code == 200, r.text
+        log.assert_max(EDITAR_DEVOLUCION)
+        log.assert_no_n_plus_one()
+
+def test_listar_devoluciones_no_escala_con_las_filas(client, auth, productos):
+    for _ in range(5):
+        venta_id = _venta(client, auth, productos)
+        client.post("/devoluciones/", json={"venta_id": venta_id, "items": _items(productos)})
+
+    with capture_queries() as log:
+        r = client.get("/devoluciones/")
+    assert r.status_code == 200
+    assert len(r.json()) >= 5
+    log.assert_max(2)   # devoluciones + sus detalles
+    log.assert_no_n_plus_one()
+
+def test_venta_completa_en_consultas_fijas(client, auth, productos):
+    venta_id = _venta(client, auth, productos)
+    for producto_id in productos[:3]:
+        client.post("/devoluciones/", json={"venta_id": venta_id, "items": _items([producto_id])})
+
+    with capture_queries() as log:
+        r = client.get(f"/ventas/{venta_id}/completa", headers=auth)
+    assert r.status_code == 200
+    assert len(r.json()["detalles"]) == len(productos)
+    log.assert_max(COMPLETA)
+    log.assert_no_n_plus_one()
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Callback que recibe (canal, mensaje ya serializado) y lo entrega a los sockets locales
+Deliver = Callable[[str, str], Awaitable[None]]
+
+class BroadcastBackend(ABC):
+    """
+    Reparte los mensajes de los canales WebSocket entre procesos/hosts.
+    Cada proceso publica en el backend y recibe de él lo que debe
+    entregar a sus propios sockets.
+    """
+
+    # Si el backend puede repartir entre procesos en este momento
+    connected = True
+
+    def attach(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, channel: str, text: str) -> None:
+        ...
+
+class MemoryBackend(BroadcastBackend):
+    """Un solo proceso: entrega directamente a los sockets locales."""
+
+    async def publish(self, channel: str, text: str) -> None:
+        await self._deliver(channel, text)
+
+def _encode_command(*args: str) -> bytes:
+    out = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg.encode()
+        out.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+    return b"".join(out)
+
+async def _read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Conexión cerrada por el servidor")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        raise ConnectionError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        size = int(rest)
+        if size < 0:
+            return None
+        data = await reader.readexactly(size + 2)
+        return data[:-2].decode()
+    if kind == b"*":
+        return [await _read_reply(reader) for _ in range(int(rest))]
+    raise ConnectionError(f"Respuesta inesperada: {line!r}")
+
+class RedisBackend(BroadcastBackend):
+    """
+    Pub/sub sobre el protocolo de Redis (RESP) con asyncio puro, sin
+    dependencias extra. Sirve con Redis o cualquier servidor compatible.
+    """
+
+    def __init__(self, url: str, prefix: str = "ws:", reconnect_delay: float = 1.0, timeout: float = 2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.prefix = prefix
+        self.reconnect_delay = reconnect_delay
+        # Tope para conectar y para cada PUBLISH: con Redis caído no se cuelgan los broadcasts
+        self.timeout = timeout
+        self._pub: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
+        self._pub_lock = asyncio.Lock()
+        self._sub_task: asyncio.Task | None = None
+        self.connected = False
+
+    async def _open(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout=self.timeout
+        )
+        if self.password:
+            writer.write(_encode_command("AUTH", self.password))
+            await asyncio.wait_for(_read_reply(reader), timeout=self.timeout)
+        return reader, writer
+
+    async def start(self) -> None:
+        self._sub_task = asyncio.create_task(self._subscribe_loop())
+
+    async def stop(self) -> None:
+        self.connected = False
+        if self._sub_task:
+            self._sub_task.cancel()
+            try:
+                await self._sub_task
+            except asyncio.CancelledError:
+                pass
+        if self._pub:
+            self._pub[1].close()
+            self._pub = None
+
+    async def _subscribe_loop(self) -> None:
+        while True:
+            writer = None
+            try:
+                reader, writer = await self._open()
+                writer.write(_encode_command("PSUBSCRIBE", f"{self.prefix}*"))
+                await writer.drain()
+                while True:
+                    reply = await _read_reply(reader)
+                    if not isinstance(reply, list) or not reply:
+                        continue
+                    # ["pmessage", patrón, canal, mensaje]
+                    if reply[0] == "pmessage":
+                        channel = reply[2][len(self.prefix):]
+                        await self._deliver(channel, reply[3])
+                    elif reply[0] == "psubscribe":
+                        # Suscripción confirmada: desde acá los mensajes vuelven por Redis
+                        self.connected = True
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Backend de broadcast desconectado: %s", e)
+                self.connected = False
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                if writer:
+                    writer.close()
+
+    async def publish(self, channel: str, text: str) -> None:
+        # Sin suscripción activa (reconectando) Redis no nos devuelve el mensaje:
+        # se entrega acá a los sockets locales además de publicarlo para el resto
+        local = not self.connected
+        async with self._pub_lock:
+            try:
+                await asyncio.wait_for(self._publish(channel, text), timeout=self.timeout)
+            except Exception as e:
+                logger.warning("No se pudo publicar en el backend de broadcast: %s", e)
+                if self._pub:
+                    self._pub[1].close()
+                self._pub = None
+                local = True
+        if local:
+            await self._deliver(channel, text)
+
+    async def _publish(self, channel: str, text: str) -> None:
+        if self._pub is None:
+            self._pub = await self._open()
+        reader, writer = self._pub
+        writer.write(_encode_command("PUBLISH", f"{self.prefix}{channel}", text))
+        await writer.drain()
+        await _read_reply(reader)
+
+def create_backend(url: str | None) -> BroadcastBackend:
+    if not url or url.startswith("memory://"):
+        return MemoryBackend()
+    if url.startswith("redis://"):
+        return RedisBackend(url)
+    raise ValueError(f"Backend de broadcast no soportado: {url}")
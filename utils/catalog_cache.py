@@ -0,0 +1,42 @@
+from threading import Lock
+from typing import Callable
+
+from pydantic import TypeAdapter
+
+from schemas.producto import Producto
+
+_productos_adapter = TypeAdapter(list[Producto])
+
+class CatalogCache:
+    """
+    Cache del listado de productos ya serializado a JSON, por versión del
+    catálogo (la fila de catalogo_version que incrementa cada cambio de
+    productos). El ETag es la versión: vale entre workers y se valida con
+    una consulta por clave primaria, sin cargar ni serializar el catálogo.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._version = -1
+        self._body = b""
+
+    @staticmethod
+    def etag(version: int) -> str:
+        return f'"catalogo-{version}"'
+
+    def get(self, version: int, loader: Callable[[], list[Producto]]) -> bytes:
+        """Body de la versión pedida; si no es la que está en cache lo reconstruye con loader()."""
+        with self._lock:
+            if self._version == version:
+                return self._body
+
+        body = _productos_adapter.dump_json(loader())
+        with self._lock:
+            # No pisar una versión más nueva cargada por otro request
+            if version >= self._version:
+                self._version = version
+                self._body = body
+        return body
+
+# Instancia única compartida por servicios y routers
+catalog_cache = CatalogCache()
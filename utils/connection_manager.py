@@ -1,26 +1,134 @@
+import asyncio
+import json
+import time
 from fastapi import WebSocket
-from typing import List
+from typing import Dict, List
+
+from config.settings import settings
+from utils.broadcast_backend import BroadcastBackend, MemoryBackend, create_backend
+from utils.metrics import metrics
+
+class _Client:
+    """
+    Conexión suscripta a un canal: cola de salida acotada y una tarea
+    que le va enviando los mensajes, así un cliente lento no frena al resto.
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max_queue)
+        self.task: asyncio.Task | None = None
 
 class ConnectionManager:
-    def __init__(self):
+    def __init__(
+        self,
+        send_timeout: float = 5.0,
+        max_queue: int = 100,
+        overflow_policy: str = "drop_oldest",
+        backend: BroadcastBackend | None = None,
+    ):
+        # overflow_policy: "drop_oldest" descarta el mensaje más viejo de la cola,
+        # "disconnect" desconecta al cliente que no da abasto
+        self.send_timeout = send_timeout
+        self.max_queue = max_queue
+        self.overflow_policy = overflow_policy
         self.active_stock: List[WebSocket] = []
         self.active_sales: List[WebSocket] = []
+        self._clients: Dict[WebSocket, _Client] = {}
+        self._closing: set[asyncio.Task] = set()
+        self.backend = backend or MemoryBackend()
+        self.backend.attach(self._deliver)
+
+    async def start(self):
+        await self.backend.start()
+
+    async def stop(self):
+        await self.backend.stop()
+
+    def status(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "backend_connected": self.backend.connected,
+            "connections": {"stock": len(self.active_stock), "ventas": len(self.active_sales)},
+        }
+
+    def _channel(self, channel: str) -> List[WebSocket]:
+        return self.active_stock if channel == "stock" else self.active_sales
 
     async def connect(self, websocket: WebSocket, channel: str):
         await websocket.accept()
-        if channel == "stock":
-            self.active_stock.append(websocket)
-        else:
-            self.active_sales.append(websocket)
+        client = _Client(websocket, self.max_queue)
+        client.task = asyncio.create_task(self._sender(client, channel))
+        self._clients[websocket] = client
+        self._channel(channel).append(websocket)
 
     def disconnect(self, websocket: WebSocket, channel: str):
-        lst = self.active_stock if channel == "stock" else self.active_sales
-        lst.remove(websocket)
+        lst = self._channel(channel)
+        if websocket in lst:
+            lst.remove(websocket)
+        client = self._clients.pop(websocket, None)
+        if client and client.task and client.task is not asyncio.current_task():
+            client.task.cancel()
+
+    async def _evict(self, client: _Client, channel: str):
+        self._drop(client, channel)
+        await self._close(client)
+
+    def _drop(self, client: _Client, channel: str):
+        metrics.inc("websocket_evictions_total", (channel,))
+        self.disconnect(client.websocket, channel)
+
+    async def _close(self, client: _Client):
+        # Un socket medio muerto puede no completar nunca el cierre
+        try:
+            await asyncio.wait_for(client.websocket.close(), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    async def _sender(self, client: _Client, channel: str):
+        while True:
+            text = await client.queue.get()
+            try:
+                await asyncio.wait_for(
+                    client.websocket.send_text(text), timeout=self.send_timeout
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # socket muerto o demasiado lento: lo sacamos del canal
+                await self._evict(client, channel)
+                return
 
     async def broadcast(self, message: dict, channel: str):
-        lst = self.active_stock if channel == "stock" else self.active_sales
-        for ws in lst:
-            await ws.send_json(message)
+        # Serializamos una sola vez; el backend lo reparte a todos los procesos
+        start = time.perf_counter()
+        text = json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+        await self.backend.publish(channel, text)
+        metrics.observe("websocket_broadcast_duration_seconds", (channel,), time.perf_counter() - start)
+
+    async def _deliver(self, channel: str, text: str):
+        for ws in list(self._channel(channel)):
+            client = self._clients.get(ws)
+            if client is None:
+                continue
+            try:
+                client.queue.put_nowait(text)
+            except asyncio.QueueFull:
+                if self.overflow_policy == "disconnect":
+                    # Se saca del canal ya; el cierre va aparte para no frenar el fan-out
+                    self._drop(client, channel)
+                    task = asyncio.create_task(self._close(client))
+                    self._closing.add(task)
+                    task.add_done_callback(self._closing.discard)
+                    continue
+                client.queue.get_nowait()
+                client.queue.put_nowait(text)
+                metrics.inc("websocket_messages_dropped_total", (channel,))
 
 # ¡Aquí creamos la instancia única!
-manager = ConnectionManager()
+manager = ConnectionManager(backend=create_backend(settings.broadcast_backend_url))
+
+@metrics.collector
+def _ws_gauges():
+    yield "websocket_connections", ("stock",), len(manager.active_stock)
+    yield "websocket_connections", ("ventas",), len(manager.active_sales)
@@ -0,0 +1,46 @@
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, func, literal
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.sql.functions import FunctionElement
+
+# Cursor opaco para paginación keyset sobre (fecha, id)
+
+def encode_cursor(fecha: datetime, id: int) -> str:
+    raw = f"{fecha.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        fecha, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(fecha), int(id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+class _FechaKeyset(FunctionElement):
+    name = "fecha_keyset"
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(_FechaKeyset)
+def _fecha_keyset(element, compiler, **kw):
+    # MySQL compara DATETIME con DATETIME: la columna va tal cual y usa el índice
+    return compiler.process(element.clauses, **kw)
+
+@compiles(_FechaKeyset, "sqlite")
+def _fecha_keyset_sqlite(element, compiler, **kw):
+    # SQLite guarda texto: func.now() queda 'YYYY-MM-DD HH:MM:SS' y un parámetro
+    # 'YYYY-MM-DD HH:MM:SS.000000', así que se comparan en un mismo formato
+    return compiler.process(func.strftime("%Y-%m-%d %H:%M:%f", *element.clauses), **kw)
+
+def fecha_keyset(valor) -> ColumnElement:
+    """
+    Columna DateTime o valor del cursor listo para comparar y ordenar en una
+    paginación keyset: ambos lados deben pasar por acá.
+    """
+    if isinstance(valor, datetime):
+        valor = literal(valor, DateTime())
+    return _FechaKeyset(valor)
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from config.database import async_engine, pools_snapshot
+from config.settings import settings
+from utils.connection_manager import manager
+from utils.image_pipeline import image_pipeline
+
+class ReadinessProbe:
+    """
+    Chequeo de readiness: SELECT 1 con timeout, uso del pool, escritura en
+    uploads y estado de los WebSockets. El resultado se reutiliza durante
+    ttl segundos y los probes concurrentes esperan al mismo chequeo, así
+    el balanceador no suma carga a la base.
+    """
+
+    def __init__(self, ttl: float = 2.0, db_timeout: float = 1.0):
+        self.ttl = ttl
+        self.db_timeout = db_timeout
+        self._lock = asyncio.Lock()
+        self._checked_at = 0.0
+        self._result: tuple[bool, dict] | None = None
+
+    async def check(self) -> tuple[bool, dict]:
+        """Devuelve (listo, detalle)."""
+        if self._fresh():
+            return self._result
+        async with self._lock:
+            if self._fresh():
+                return self._result   # otro probe lo recalculó mientras esperábamos
+            self._result = await self._run()
+            self._checked_at = time.monotonic()
+            return self._result
+
+    def _fresh(self) -> bool:
+        return self._result is not None and time.monotonic() - self._checked_at < self.ttl
+
+    async def _run(self) -> tuple[bool, dict]:
+        database, uploads = await asyncio.gather(self._database(), asyncio.to_thread(self._uploads))
+        pool = self._pool()
+        websockets = manager.status()
+        # Sin Redis los mensajes igual llegan a los sockets locales: no saca al worker de servicio
+        ready = database["ok"] and pool["ok"] and uploads["ok"]
+        return ready, {
+            "status": "ready" if ready else "unavailable",
+            "checked_at": time.time(),
+            "checks": {"database": database, "pool": pool, "uploads": uploads, "websockets": websockets},
+        }
+
+    async def _database(self) -> dict:
+        start = time.perf_counter()
+        try:
+            # El timeout cubre también la espera por una conexión del pool
+            await asyncio.wait_for(_select_1(), self.db_timeout)
+        except asyncio.TimeoutError:
+            return {"ok": False, "error": f"Sin respuesta en {self.db_timeout:g} s"}
+        except Exception as e:
+            return {"ok": False, "error": type(e).__name__}
+        return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+    def _pool(self) -> dict:
+        # Los dos pools del worker: agotado cualquiera, los requests que lo usan esperarían hasta DB_POOL_TIMEOUT
+        pools = {nombre: _uso(snap) for nombre, snap in pools_snapshot().items()}
+        return {"ok": all(p["ok"] for p in pools.values()), **pools}
+
+    def _uploads(self) -> dict:
+        try:
+            with tempfile.NamedTemporaryFile(dir=image_pipeline.dir, prefix=".health-"):
+                pass
+        except OSError as e:
+            return {"ok": False, "path": str(image_pipeline.dir), "error": e.strerror or type(e).__name__}
+        return {"ok": True, "path": str(image_pipeline.dir), "free_mb": _free_mb(image_pipeline.dir)}
+
+def _uso(snap: dict) -> dict:
+    capacidad = snap.get("size", 0) + snap.get("max_overflow", 0)
+    if capacidad <= 0:
+        return {"ok": True, **snap}
+    uso = snap["checked_out"] / capacidad
+    return {"ok": uso < 1, "utilization": round(uso, 3), **snap}
+
+async def _select_1() -> None:
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+def _free_mb(path) -> int | None:
+    try:
+        st = os.statvfs(path)
+    except (AttributeError, OSError):
+        return None   # statvfs no existe en Windows
+    return st.f_bavail * st.f_frsize // (1024 * 1024)
+
+# Instancia única
+readiness = ReadinessProbe(ttl=settings.health_cache_seconds, db_timeout=settings.health_db_timeout)
@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from fastapi import HTTPException
+from fastapi.staticfiles import StaticFiles
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Lado máximo en píxeles de cada variante
+VARIANTES = {"thumb": 160, "medium": 640, "large": 1280}
+FORMATOS = {"webp": ("WEBP", {"quality": 80, "method": 4}),
+            "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True})}
+
+URL_PREFIX = "/uploads/img"
+_URL_RE = re.compile(rf"^{URL_PREFIX}/([0-9a-f]{{20}})_large\.jpg$")
+
+class ImagePipeline:
+    """
+    Procesa las imágenes subidas fuera del event loop: genera variantes
+    redimensionadas en WebP y JPEG con nombre derivado del contenido
+    (<hash>_<variante>.<ext>), así una misma foto se guarda una sola vez
+    y las URLs pueden cachearse como inmutables.
+    """
+
+    def __init__(self, upload_dir: Path = Path("uploads"), max_workers: int = 2):
+        # Sin efectos al importar: el directorio y los hilos se crean en start() o al primer uso
+        self.dir = upload_dir / "img"
+        self.max_workers = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self.start()
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="imagenes")
+            return self._executor
+
+    async def process(self, data: bytes) -> str:
+        """Devuelve la URL principal (variante large en JPEG)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self._process, data)
+
+    def _process(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()[:20]
+        url = f"{URL_PREFIX}/{digest}_large.jpg"
+        if all((self.dir / f"{digest}_{v}.{ext}").exists() for v in VARIANTES for ext in FORMATOS):
+            return url   # misma imagen ya procesada
+
+        try:
+            with Image.open(BytesIO(data)) as img:
+                img = ImageOps.exif_transpose(img)
+                img.load()
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            raise HTTPException(status_code=400, detail="Imagen inválida")
+
+        # JPEG no tiene transparencia: se compone sobre fondo blanco
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            fondo = Image.new("RGB", img.size, (255, 255, 255))
+            fondo.paste(img, mask=img.getchannel("A"))
+            img = fondo
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        for variante, lado in VARIANTES.items():
+            copia = img.copy()
+            copia.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+            for ext, (formato, opciones) in FORMATOS.items():
+                destino = self.dir / f"{digest}_{variante}.{ext}"
+                # Temporal con nombre único: dos subidas de la misma imagen no se pisan
+                with tempfile.NamedTemporaryFile(dir=self.dir, prefix=f".{destino.name}.", delete=False) as tmp:
+                    try:
+                        copia.save(tmp, formato, **opciones)
+                    except BaseException:
+                        tmp.close()
+                        os.unlink(tmp.name)
+                        raise
+                os.replace(tmp.name, destino)   # escritura atómica
+        return url
+
+def variant_urls(image_url: str | None) -> dict[str, dict[str, str]] | None:
+    """URLs de todas las variantes a partir de image_url (None si es una imagen previa al pipeline)."""
+    m = _URL_RE.match(image_url or "")
+    if not m:
+        return None
+    digest = m.group(1)
+    return {
+        variante: {ext: f"{URL_PREFIX}/{digest}_{variante}.{ext}" for ext in FORMATOS}
+        for variante in VARIANTES
+    }
+
+class UploadsStaticFiles(StaticFiles):
+    # Las variantes tienen nombre por contenido: nunca cambian
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if path.startswith("img/") and response.status_code == 200:
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+# Instancia única
+image_pipeline = ImagePipeline()
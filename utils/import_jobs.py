@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+
+from config.database import SessionLocal
+from models.productos import ImportacionPrecios
+from services.productos import ProductoService
+from utils.connection_manager import manager
+
+logger = logging.getLogger(__name__)
+
+TERMINADOS = ("completado", "error")
+
+class ImportJobs:
+    """
+    Importaciones de precios en segundo plano: el Excel se procesa en un
+    pool de hilos con su propia sesión y el progreso queda consultable por id.
+    El estado se guarda en importaciones_precios, así la consulta funciona
+    desde cualquier worker y después de un reinicio.
+    """
+
+    def __init__(self, max_workers: int = 2, max_jobs: int = 100, stale_after: timedelta = timedelta(minutes=15)):
+        # Sin efectos al importar: el pool de hilos se crea al primer submit y se cierra en shutdown()
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.stale_after = stale_after
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="import")
+            return self._executor
+
+    def get(self, job_id: str) -> dict | None:
+        with SessionLocal() as db:
+            job = db.get(ImportacionPrecios, job_id)
+            if job is None:
+                return None
+            data = _a_dict(job)
+        if data["status"] not in TERMINADOS and datetime.now() - job.actualizado_en > self.stale_after:
+            # Sin progreso hace rato: el worker que la procesaba se reinició o murió
+            data.update(status="error", detail="Importación interrumpida")
+        return data
+
+    def submit(self, file_bytes: bytes, loop: asyncio.AbstractEventLoop) -> dict:
+        ahora = datetime.now()
+        job = ImportacionPrecios(
+            job_id=uuid.uuid4().hex, status="pendiente", processed=0, updated=0,
+            errors=[], created_at=ahora, actualizado_en=ahora,
+        )
+        with SessionLocal() as db:
+            db.add(job)
+            db.commit()
+            data = _a_dict(job)
+        self._get_executor().submit(self._run, data["job_id"], file_bytes, loop)
+        return data
+
+    def _trim(self) -> None:
+        # Conservamos solo los últimos trabajos terminados; los pendientes o en curso nunca se descartan
+        with SessionLocal() as db:
+            sobrantes = db.scalars(
+                select(ImportacionPrecios.job_id)
+                .where(ImportacionPrecios.status.in_(TERMINADOS))
+                .order_by(ImportacionPrecios.created_at.desc())
+                .offset(self.max_jobs)
+            ).all()
+            if sobrantes:
+                db.execute(delete(ImportacionPrecios).where(ImportacionPrecios.job_id.in_(sobrantes)))
+                db.commit()
+
+    def _update(self, job_id: str, **fields) -> dict | None:
+        with SessionLocal() as db:
+            job = db.get(ImportacionPrecios, job_id)
+            if job is None:
+                return None
+            for campo, valor in fields.items():
+                setattr(job, campo, valor)
+            job.actualizado_en = datetime.now()
+            db.commit()
+            return _a_dict(job)
+
+    def _notify(self, job: dict | None, loop: asyncio.AbstractEventLoop) -> None:
+        if job is None:
+            return
+        message = {
+            "event": "import_progress",
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "processed": job["processed"],
+            "updated": job["updated"],
+            "errors": len(job["errors"]),
+        }
+        try:
+            asyncio.run_coroutine_threadsafe(manager.broadcast(message, "stock"), loop)
+        except RuntimeError:
+            # Loop cerrado (apagando el servidor): el aviso se pierde, la importación sigue
+            logger.warning("No se pudo notificar el progreso de la importación %s", job["job_id"])
+
+    def _run(self, job_id: str, file_bytes: bytes, loop: asyncio.AbstractEventLoop) -> None:
+        self._notify(self._update(job_id, status="procesando"), loop)
+
+        def on_progress(processed: int, updated: int, errors: list[str]) -> None:
+            self._notify(
+                self._update(job_id, processed=processed, updated=updated, errors=list(errors)),
+                loop,
+            )
+
+        db = SessionLocal()
+        try:
+            updated, errors = ProductoService(db).bulk_update_prices_from_excel(
+                file_bytes, on_progress=on_progress
+            )
+            job = self._update(
+                job_id, status="completado", updated=updated, errors=errors,
+                finished_at=datetime.now(),
+            )
+        except HTTPException as e:
+            job = self._update(
+                job_id, status="error", detail=str(e.detail)[:255],
+                finished_at=datetime.now(),
+            )
+        except Exception:
+            logger.exception("Error en la importación %s", job_id)
+            job = self._update(
+                job_id, status="error", detail="Error interno al importar precios",
+                finished_at=datetime.now(),
+            )
+        finally:
+            db.close()
+        self._trim()
+        self._notify(job, loop)
+
+def _a_dict(job: ImportacionPrecios) -> dict:
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "processed": job.processed,
+        "updated": job.updated,
+        "errors": list(job.errors or []),
+        "detail": job.detail,
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+# Instancia única
+import_jobs = ImportJobs()
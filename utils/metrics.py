@@ -0,0 +1,132 @@
+import threading
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+# Buckets de latencia en segundos (estilo Prometheus)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class _Shard:
+    # Valores de un solo hilo: se escriben sin locks y se suman al exportar
+    def __init__(self) -> None:
+        self.values: dict[tuple, float] = {}
+        self.histograms: dict[tuple, list[float]] = {}
+
+class Metrics:
+    """
+    Registro de métricas en formato de exposición de Prometheus, sin dependencias.
+    Cada hilo escribe en su propio shard (sin locks en el camino caliente);
+    /metrics suma los shards al momento del scrape.
+    """
+
+    def __init__(self) -> None:
+        self._defs: dict[str, tuple[str, str, tuple[str, ...], tuple[float, ...]]] = {}
+        self._local = threading.local()
+        self._shards: list[_Shard] = []
+        self._lock = threading.Lock()   # solo para registrar shards nuevos
+        self._collectors: list[Callable[[], Iterable[tuple[str, tuple, float]]]] = []
+
+    def define(self, name: str, kind: str, help: str, labels: tuple[str, ...] = (),
+               buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        # kind: "counter", "gauge" o "histogram"
+        self._defs[name] = (kind, help, labels, buckets)
+
+    def collector(self, fn: Callable[[], Iterable[tuple[str, tuple, float]]]):
+        """Gauges calculados al exportar: fn devuelve (nombre, valores_de_labels, valor)."""
+        self._collectors.append(fn)
+        return fn
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def inc(self, name: str, labels: tuple = (), value: float = 1.0) -> None:
+        values = self._shard().values
+        key = (name, labels)
+        values[key] = values.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        histograms = self._shard().histograms
+        key = (name, labels)
+        hist = histograms.get(key)
+        buckets = self._defs[name][3]
+        if hist is None:
+            # [conteo por bucket..., +Inf, suma]
+            hist = histograms[key] = [0.0] * (len(buckets) + 2)
+        hist[bisect_left(buckets, value)] += 1
+        hist[-1] += value
+
+    def _merge(self) -> tuple[dict[tuple, float], dict[tuple, list[float]]]:
+        with self._lock:
+            shards = list(self._shards)
+        values: dict[tuple, float] = {}
+        histograms: dict[tuple, list[float]] = {}
+        for shard in shards:
+            for key, v in dict(shard.values).items():
+                values[key] = values.get(key, 0.0) + v
+            for key, hist in dict(shard.histograms).items():
+                acc = histograms.setdefault(key, [0.0] * len(hist))
+                for i, v in enumerate(list(hist)):
+                    acc[i] += v
+        for fn in self._collectors:
+            for name, labels, v in fn():
+                values[(name, labels)] = v
+        return values, histograms
+
+    def render(self) -> str:
+        values, histograms = self._merge()
+        lines: list[str] = []
+        for name, (kind, help, labelnames, buckets) in self._defs.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (n, labels), hist in sorted(histograms.items()):
+                    if n != name:
+                        continue
+                    base = _labels(labelnames, labels)
+                    acumulado = 0.0
+                    for le, count in zip((*buckets, "+Inf"), hist[:-1]):
+                        acumulado += count
+                        lines.append(f"{name}_bucket{_labels((*labelnames, 'le'), (*labels, le))} {_num(acumulado)}")
+                    lines.append(f"{name}_sum{base} {_num(hist[-1])}")
+                    lines.append(f"{name}_count{base} {_num(acumulado)}")
+            else:
+                for (n, labels), v in sorted(values.items()):
+                    if n == name:
+                        lines.append(f"{name}{_labels(labelnames, labels)} {_num(v)}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in zip(names, values)) + "}"
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(v)
+
+# Instancia única y métricas de la app
+metrics = Metrics()
+metrics.define("http_requests_total", "counter", "Requests HTTP atendidos", ("method", "route", "status"))
+metrics.define("http_request_duration_seconds", "histogram", "Latencia de los requests HTTP", ("method", "route"))
+metrics.define("http_requests_in_flight", "gauge", "Requests HTTP en curso")
+metrics.define("websocket_connections", "gauge", "Conexiones WebSocket abiertas", ("channel",))
+metrics.define("websocket_broadcast_duration_seconds", "histogram", "Duración de cada broadcast", ("channel",),
+               buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+metrics.define("websocket_messages_dropped_total", "counter", "Mensajes descartados por cola llena", ("channel",))
+metrics.define("websocket_evictions_total", "counter", "Clientes desconectados por lentos o caídos", ("channel",))
+metrics.define("ventas_creadas_total", "counter", "Ventas creadas", ("forma_pago",))
+metrics.define("ventas_monto_total", "counter", "Monto neto de las ventas creadas", ("forma_pago",))
+metrics.define("db_pool_connections", "gauge", "Conexiones del pool por estado", ("engine", "state"))
+metrics.define("db_pool_checkouts_total", "counter", "Checkouts de conexiones del pool", ("engine",))
+metrics.define("db_pool_timeouts_total", "counter", "Timeouts esperando una conexión del pool", ("engine",))
+metrics.define("db_pool_wait_seconds_total", "counter", "Tiempo total esperando conexiones del pool", ("engine",))
+metrics.define("user_cache_hits_total", "counter", "Autenticaciones resueltas desde la cache de usuarios")
+metrics.define("user_cache_misses_total", "counter", "Autenticaciones que consultaron la base")
+metrics.define("user_cache_entries", "gauge", "Usuarios en la cache")
@@ -0,0 +1,136 @@
+import re
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from sqlalchemy import event
+
+# Tiempos acumulados del request en curso: {"db": seg, "auth": seg}.
+# El dict es mutable a propósito: el threadpool copia el contexto pero
+# comparte el mismo objeto, así las consultas sync también suman.
+_timings: ContextVar[dict[str, float] | None] = ContextVar("request_timings", default=None)
+
+def start_request() -> dict[str, float]:
+    timings: dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+def add_timing(name: str, seconds: float) -> None:
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+@contextmanager
+def timed(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(name, time.perf_counter() - start)
+
+
+# --- Registro de consultas (modo debug y tests) ---
+
+_PLACEHOLDERS = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s)(?:\s*,\s*(?:\?|%s|%\(\w+\)s))*\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    """Forma de la sentencia: listas IN (?, ?, ...) colapsadas y espacios normalizados."""
+    return _ESPACIOS.sub(" ", _PLACEHOLDERS.sub("(?)", statement)).strip()
+
+class QueryLog:
+    """
+    Consultas de un request (o de un bloque en un test): cantidad, tiempo y
+    cuántas veces se repite cada forma de sentencia, para detectar N+1.
+    """
+
+    def __init__(self, threshold: int = 5):
+        self.threshold = threshold
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter[str] = Counter()
+        self._lock = Lock()
+
+    def record(self, statement: str, seconds: float) -> None:
+        shape = statement_shape(statement)
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.shapes[shape] += 1
+
+    def repeated(self) -> dict[str, int]:
+        # Sentencias idénticas ejecutadas threshold veces o más: probable N+1
+        with self._lock:
+            return {shape: n for shape, n in self.shapes.items() if n >= self.threshold}
+
+    def summary(self) -> dict:
+        return {
+            "queries": self.count,
+            "db_ms": round(self.seconds * 1000, 3),
+            "repeated": self.repeated(),
+        }
+
+    def assert_max(self, n: int) -> None:
+        assert self.count <= n, f"Se esperaban como máximo {n} consultas y hubo {self.count}: {dict(self.shapes)}"
+
+    def assert_no_n_plus_one(self) -> None:
+        repeated = self.repeated()
+        assert not repeated, f"Posible N+1: {repeated}"
+
+_query_log: ContextVar[QueryLog | None] = ContextVar("query_log", default=None)
+_capturas: list[QueryLog] = []
+_capturas_lock = Lock()
+
+# Últimos requests registrados con DEBUG_QUERIES, para /debug/queries
+query_history: deque[dict] = deque(maxlen=200)
+
+def start_query_log(threshold: int) -> QueryLog:
+    log = QueryLog(threshold)
+    _query_log.set(log)
+    return log
+
+@contextmanager
+def capture_queries(threshold: int = 5):
+    """
+    Para tests: registra todas las consultas ejecutadas dentro del bloque,
+    en cualquier hilo (TestClient atiende el request en otro hilo).
+
+        with capture_queries() as log:
+            client.get("/devoluciones/")
+        log.assert_max(2)
+        log.assert_no_n_plus_one()
+    """
+    log = QueryLog(threshold)
+    with _capturas_lock:
+        _capturas.append(log)
+    try:
+        yield log
+    finally:
+        with _capturas_lock:
+            _capturas.remove(log)
+
+def instrument_engine(engine) -> None:
+    """Suma a "db" el tiempo de cada consulta del engine (sync o async.sync_engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_start"].pop()
+        add_timing("db", seconds)
+        log = _query_log.get()
+        if log is not None:
+            log.record(statement, seconds)
+        if _capturas:
+            for captura in list(_capturas):
+                captura.record(statement, seconds)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # La consulta falló: descartar su marca de inicio
+        if context.connection is not None and context.connection.info.get("query_start"):
+            context.connection.info["query_start"].pop()
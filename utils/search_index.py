@@ -0,0 +1,171 @@
+import bisect
+import time
+import unicodedata
+from threading import Lock
+from typing import Callable, Iterable
+
+def _normalizar(texto: str) -> str:
+    # minúsculas y sin tildes, para que "azucar" encuentre "Azúcar"
+    texto = unicodedata.normalize("NFKD", texto or "").lower()
+    return "".join(ch for ch in texto if not unicodedata.combining(ch))
+
+def _tokens(texto: str) -> list[str]:
+    return [t for t in "".join(ch if ch.isalnum() else " " for ch in _normalizar(texto)).split() if t]
+
+def _trigramas(token: str) -> set[str]:
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class ProductSearchIndex:
+    """
+    Índice en memoria para buscar productos por código exacto, prefijo
+    de palabras del nombre y coincidencia aproximada por trigramas.
+    Se construye la primera vez desde la base y luego lo mantienen
+    actualizado los métodos de escritura de ProductoService.
+    """
+
+    def __init__(self, max_age: float = 300.0, min_similarity: float = 0.4):
+        # max_age: reconstrucción periódica para tomar cambios de otros workers
+        self.max_age = max_age
+        self.min_similarity = min_similarity
+        self._lock = Lock()
+        self._built_at: float | None = None
+        self._docs: dict[int, tuple[str, list[str]]] = {}   # id -> (codigo, tokens)
+        self._codigos: dict[str, int] = {}
+        self._sorted_codigos: list[str] = []
+        self._token_ids: dict[str, set[int]] = {}
+        self._sorted_tokens: list[str] = []
+        self._trigram_ids: dict[str, set[int]] = {}
+
+    # --- mantenimiento -------------------------------------------------
+
+    def _add(self, id: int, nombre: str, codigo: str) -> None:
+        tokens = _tokens(nombre)
+        cod = _normalizar(codigo).strip()
+        self._docs[id] = (cod, tokens)
+        if cod not in self._codigos:
+            bisect.insort(self._sorted_codigos, cod)
+        self._codigos[cod] = id
+        for tok in set(tokens):
+            ids = self._token_ids.get(tok)
+            if ids is None:
+                ids = self._token_ids[tok] = set()
+                bisect.insort(self._sorted_tokens, tok)
+            ids.add(id)
+            for tri in _trigramas(tok):
+                self._trigram_ids.setdefault(tri, set()).add(id)
+
+    def _remove(self, id: int) -> None:
+        doc = self._docs.pop(id, None)
+        if doc is None:
+            return
+        cod, tokens = doc
+        if self._codigos.get(cod) == id:
+            del self._codigos[cod]
+            pos = bisect.bisect_left(self._sorted_codigos, cod)
+            if pos < len(self._sorted_codigos) and self._sorted_codigos[pos] == cod:
+                self._sorted_codigos.pop(pos)
+        for tok in set(tokens):
+            ids = self._token_ids.get(tok)
+            if ids is not None:
+                ids.discard(id)
+                if not ids:
+                    del self._token_ids[tok]
+                    pos = bisect.bisect_left(self._sorted_tokens, tok)
+                    if pos < len(self._sorted_tokens) and self._sorted_tokens[pos] == tok:
+                        self._sorted_tokens.pop(pos)
+            for tri in _trigramas(tok):
+                tri_ids = self._trigram_ids.get(tri)
+                if tri_ids is not None:
+                    tri_ids.discard(id)
+                    if not tri_ids:
+                        del self._trigram_ids[tri]
+
+    def rebuild(self, rows: Iterable[tuple[int, str, str]]) -> None:
+        with self._lock:
+            self._docs.clear()
+            self._codigos.clear()
+            self._sorted_codigos.clear()
+            self._token_ids.clear()
+            self._sorted_tokens.clear()
+            self._trigram_ids.clear()
+            for id, nombre, codigo in rows:
+                self._add(id, nombre, codigo)
+            self._built_at = time.monotonic()
+
+    def upsert(self, id: int, nombre: str, codigo: str) -> None:
+        with self._lock:
+            if self._built_at is None:
+                return  # se construye completo en la primera búsqueda
+            self._remove(id)
+            self._add(id, nombre, codigo)
+
+    def remove(self, id: int) -> None:
+        with self._lock:
+            if self._built_at is not None:
+                self._remove(id)
+
+    def needs_build(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > self.max_age
+
+    # --- búsqueda ------------------------------------------------------
+
+    def _prefix_ids(self, prefix: str) -> set[int]:
+        ids: set[int] = set()
+        pos = bisect.bisect_left(self._sorted_tokens, prefix)
+        while pos < len(self._sorted_tokens) and self._sorted_tokens[pos].startswith(prefix):
+            ids |= self._token_ids[self._sorted_tokens[pos]]
+            pos += 1
+        return ids
+
+    def search(self, q: str, limit: int = 20) -> list[int]:
+        """Devuelve los ids de los productos ordenados por relevancia."""
+        cod = _normalizar(q).strip()
+        q_tokens = _tokens(q)
+        if not cod:
+            return []
+
+        with self._lock:
+            scores: dict[int, float] = {}
+
+            # 1) Código exacto (lector de código de barras) y prefijo de código
+            exact = self._codigos.get(cod)
+            if exact is not None:
+                scores[exact] = 1000.0
+            if len(cod) >= 2:
+                pos = bisect.bisect_left(self._sorted_codigos, cod)
+                while pos < len(self._sorted_codigos) and self._sorted_codigos[pos].startswith(cod):
+                    id = self._codigos[self._sorted_codigos[pos]]
+                    if id != exact:
+                        scores[id] = max(scores.get(id, 0.0), 500.0)
+                    pos += 1
+
+            # 2) Prefijo de palabras del nombre: suma por cada palabra buscada
+            for tok in q_tokens:
+                for id in self._prefix_ids(tok):
+                    bonus = 120.0 if tok in self._docs[id][1] else 100.0
+                    scores[id] = scores.get(id, 0.0) + bonus
+
+            # 3) Tolerancia a errores de tipeo por trigramas
+            for tok in q_tokens:
+                if len(tok) < 3:
+                    continue
+                grams = _trigramas(tok)
+                shared: dict[int, int] = {}
+                for tri in grams:
+                    for id in self._trigram_ids.get(tri, ()):
+                        shared[id] = shared.get(id, 0) + 1
+                for id, n in shared.items():
+                    similarity = n / len(grams)
+                    if similarity >= self.min_similarity:
+                        scores[id] = scores.get(id, 0.0) + similarity * 80.0
+
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        return [id for id, _ in ranked[:limit]]
+
+    def ensure_built(self, loader: Callable[[], Iterable[tuple[int, str, str]]]) -> None:
+        if self.needs_build():
+            self.rebuild(loader())
+
+# Instancia única
+search_index = ProductSearchIndex()
@@ -0,0 +1,74 @@
+import asyncio
+import time
+from threading import Lock
+from typing import Callable, Iterable
+
+from utils.connection_manager import manager
+
+# (producto_id, stock_antes, umbral_antes, stock_despues, umbral_despues)
+CambioStock = tuple[int, int | None, int | None, int, int]
+
+def _bajo(stock: int | None, umbral: int | None) -> bool:
+    return stock is not None and umbral is not None and stock <= umbral
+
+class StockAlerts:
+    """
+    Detecta cuándo un producto cruza su umbral stock_bajo y avisa por /ws/stock
+    con "low_stock" o "restocked". Mantiene en memoria el conjunto de productos
+    con stock bajo para GET /productos/stock-bajo.
+    """
+
+    def __init__(self, max_age: float = 300.0):
+        # max_age: reconstrucción periódica para tomar cambios de otros workers
+        self.max_age = max_age
+        self._lock = Lock()
+        self._built_at: float | None = None
+        self._bajos: dict[int, tuple[int, int]] = {}   # id -> (stock, umbral)
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Los servicios corren en el threadpool; los avisos se mandan al loop principal
+        self._loop = loop
+
+    def ensure_built(self, loader: Callable[[], Iterable[tuple[int, int, int]]]) -> None:
+        if self._built_at is not None and time.monotonic() - self._built_at <= self.max_age:
+            return
+        rows = loader()
+        with self._lock:
+            self._bajos = {id: (stock, umbral) for id, stock, umbral in rows}
+            self._built_at = time.monotonic()
+
+    def low_stock_ids(self) -> list[int]:
+        with self._lock:
+            return sorted(self._bajos)
+
+    def remove(self, id: int) -> None:
+        with self._lock:
+            self._bajos.pop(id, None)
+
+    def observe(self, cambios: Iterable[CambioStock]) -> None:
+        """Registra cambios ya confirmados (después del commit) y emite los cruces de umbral."""
+        eventos = []
+        with self._lock:
+            for id, antes, umbral_antes, despues, umbral in cambios:
+                ahora_bajo = _bajo(despues, umbral)
+                if ahora_bajo:
+                    self._bajos[id] = (despues, umbral)
+                else:
+                    self._bajos.pop(id, None)
+
+                if ahora_bajo == _bajo(antes, umbral_antes):
+                    continue
+                eventos.append({
+                    "event": "low_stock" if ahora_bajo else "restocked",
+                    "producto_id": id,
+                    "stock_actual": despues,
+                    "stock_bajo": umbral,
+                })
+
+        if eventos and self._loop is not None:
+            for evento in eventos:
+                asyncio.run_coroutine_threadsafe(manager.broadcast(evento, "stock"), self._loop)
+
+# Instancia única
+stock_alerts = StockAlerts()
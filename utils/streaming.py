@@ -0,0 +1,96 @@
+import csv
+from io import StringIO
+from typing import Callable, Iterator, Literal
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import DateTime, and_, or_
+from sqlalchemy.orm import Query, Session
+
+from config.database import SessionLocal
+from utils.cursor import fecha_keyset
+
+Formato = Literal["json", "ndjson", "csv"]
+
+def _comparable(col, valor=None):
+    # Las fechas se comparan y ordenan en un formato único (ver fecha_keyset)
+    if isinstance(col.type, DateTime):
+        return fecha_keyset(col if valor is None else valor)
+    return col if valor is None else valor
+
+def _despues(clave: tuple, valores: tuple, descendente: bool):
+    # (a, b) > (va, vb) expandido a a > va OR (a = va AND b > vb): usa el índice en MySQL
+    cond = None
+    for col, valor in reversed(list(zip(clave, valores))):
+        col, valor = _comparable(col), _comparable(col, valor)
+        paso = col < valor if descendente else col > valor
+        cond = paso if cond is None else or_(paso, and_(col == valor, cond))
+    return cond
+
+def _filas(build_query: Callable[[Session], Query], clave: tuple, descendente: bool,
+           batch_size: int) -> Iterator[list]:
+    """
+    Recorre la consulta por bloques con paginación keyset sobre clave
+    (WHERE clave > última ORDER BY clave LIMIT batch_size), una consulta por bloque.
+    No depende de cursores del lado del servidor: mysqlconnector no los tiene
+    y con yield_per igual bufferea todo el resultado en el cliente.
+    Cada bloque usa una sesión propia y corta, así un cliente lento no
+    retiene una conexión del pool durante toda la descarga.
+    """
+    orden = [_comparable(col).desc() if descendente else _comparable(col) for col in clave]
+    ultimo: tuple | None = None
+    while True:
+        with SessionLocal() as db:
+            q = build_query(db).order_by(None).order_by(*orden)
+            if ultimo is not None:
+                q = q.filter(_despues(clave, ultimo, descendente))
+            bloque = q.limit(batch_size).all()
+        if not bloque:
+            return
+        yield bloque
+        if len(bloque) < batch_size:
+            return
+        siguiente = tuple(getattr(bloque[-1], col.key) for col in clave)
+        if siguiente == ultimo:
+            # Clave no única o comparación rota: cortar en vez de repetir el bloque para siempre
+            raise RuntimeError(f"La paginación keyset no avanza en {siguiente}")
+        ultimo = siguiente
+
+def _ndjson(build_query, schema: type[BaseModel], clave, descendente, batch_size: int) -> Iterator[str]:
+    for bloque in _filas(build_query, clave, descendente, batch_size):
+        yield "".join(schema.model_validate(obj).model_dump_json() + "\n" for obj in bloque)
+
+def _csv(build_query, schema: type[BaseModel], clave, descendente, batch_size: int) -> Iterator[str]:
+    buffer = StringIO()
+    campos = list(schema.model_fields)
+    writer = csv.DictWriter(buffer, fieldnames=campos)
+    writer.writeheader()
+    for bloque in _filas(build_query, clave, descendente, batch_size):
+        for obj in bloque:
+            writer.writerow(schema.model_validate(obj).model_dump(mode="json"))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def stream_response(
+    build_query: Callable[[Session], Query],
+    schema: type[BaseModel],
+    formato: Formato,
+    nombre: str,
+    clave: tuple,
+    descendente: bool = False,
+    batch_size: int = 1000,
+) -> StreamingResponse:
+    """
+    Exporta una consulta como NDJSON o CSV sin armar la lista completa en memoria.
+    build_query recibe la sesión de cada bloque y devuelve la consulta filtrada;
+    clave son las columnas únicas del orden keyset (p. ej. (Model.fecha, Model.id)).
+    """
+    if formato == "csv":
+        return StreamingResponse(
+            _csv(build_query, schema, clave, descendente, batch_size),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="{nombre}.csv"'},
+        )
+    return StreamingResponse(_ndjson(build_query, schema, clave, descendente, batch_size), media_type="application/x-ndjson")
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from threading import Lock
+import time
+
+from utils.metrics import metrics
+
+class UserCache:
+    """
+    Cache en memoria de usuarios autenticados (claims mínimos por username),
+    con TTL y tamaño acotado (LRU). Se invalida desde los endpoints de usuarios.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> dict | None:
+        with self._lock:
+            entry = self._data.get(username)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, claims = entry
+            if expires_at < time.monotonic():
+                del self._data[username]
+                self.misses += 1
+                return None
+            self._data.move_to_end(username)
+            self.hits += 1
+            return claims
+
+    def set(self, username: str, claims: dict) -> None:
+        with self._lock:
+            self._data[username] = (time.monotonic() + self.ttl, claims)
+            self._data.move_to_end(username)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, username: str | None = None) -> None:
+        # Sin username se vacía todo (ej. tras un update que cambia el nombre)
+        with self._lock:
+            if username is None:
+                self._data.clear()
+            else:
+                self._data.pop(username, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+# Instancia única compartida por JWTBearer y los routers de usuarios
+user_cache = UserCache()
+
+@metrics.collector
+def _user_cache_metrics():
+    stats = user_cache.stats()
+    yield "user_cache_hits_total", (), stats["hits"]
+    yield "user_cache_misses_total", (), stats["misses"]
+    yield "user_cache_entries", (), stats["size"]